@@ -5,28 +5,74 @@
 # - Live-ish counts from your ArcGIS layers + OpenFEMA
 # - Current weather (NWS) + active alerts (NWS)
 # - Event type + severity changes impact assumptions + staffing recommendations
-# - Dashboard auto-refresh via /api/snapshot
+#   (derived on top of one shared live-data layer, so scenario switches are cheap)
+# - Dashboard auto-refresh: changed fields pushed over SSE (/api/stream), polling fallback
+# - /api/snapshot sends a strong ETag, answers 304, and serves JSON Patch deltas (?since=)
+# - Upstream sources fetched concurrently (bounded pool, one deadline per snapshot)
+# - One pooled keep-alive HTTP session for every upstream; retry/backoff inside each call's time budget
+# - Per-host circuit breakers; one deadline budget per snapshot, late sources marked degraded
+# - UPSTREAM_MODE=record|replay|stub: capture upstream fixtures and run offline (fixtures.py)
+# - /metrics: Prometheus text (upstream latency, cache, stage timings, PDF, lockouts)
+# - Server-Timing spans + JSON timing logs per request; opt-in sampling profiler (PROFILE_SLOWEST)
+# - /api/scenarios: NumPy-vectorized event x severity x population matrix
+# - /api/uncertainty: Monte Carlo p10/p50/p90 shelter need + staffing, cached per live data version
+# - Append-only time-series history of numeric fields (raw/5m/1h, retention) at /api/history
+# - Incremental full-feature sync of HCCDA ArcGIS layers + grid spatial index (/api/features/near)
+# - Bounded LRU + TTL cache with single-flight loads and hit/miss/eviction stats
+# - Stale-while-revalidate: a background refresher re-loads sources before they expire
+# - Optional SQLite (WAL) cache backend so restarted workers start warm
 # - One-page PDF export (ReportLab canvas) that FITS and uses "Hawaii" (no okina) in PDF
+# - PDF exports queued on a small worker pool (POST /exports, poll, download); shared across workers via CACHE_DB_PATH
 
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, send_file, jsonify
+    session, send_file, jsonify, Response
 )
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from io import BytesIO
 import os
+import json
+import hashlib
 import time
 import math
+import threading
+import sqlite3
+import secrets
+import bisect
+import sys
+import heapq
+import logging
+from contextlib import contextmanager
+import queue
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
 import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
 
+import fixtures
+
+import numpy as np
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.colors import HexColor
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+
+# File locking for the history store; not available on Windows
+try:
+    import fcntl
+except Exception:
+    fcntl = None
 
 # Encryption is optional; import path differs across reportlab versions
 try:
@@ -73,6 +119,8 @@ CENSUS_API_KEY = os.environ.get("CENSUS_API_KEY", "").strip()
 
 # OpenFEMA
 FEMA_API_URL = "https://www.fema.gov/api/open/v2/DisasterDeclarationsSummaries"
+FEMA_PAGE_SIZE = 1000   # only used if $count metadata is missing
+FEMA_MAX_PAGES = 50
 
 # ArcGIS services (yours)
 HAWAII_VOLCANO_STATUS_URL = (
@@ -115,31 +163,525 @@ NWS_WATCHES_WARNINGS_URL = (
 # Hawaii County Civil Defense Agency Hub (you requested this)
 HCCDA_HUB = "https://hawaii-county-civil-defense-agency-hawaiicountygis.hub.arcgis.com"
 
+# NWS point -> observation station mapping almost never changes: keep it on disk
+NWS_STATIONS_PATH = os.environ.get("NWS_STATIONS_PATH") or os.path.join(app.root_path, "data", "nws_stations.json")
+NWS_STATION_TTL_SECONDS = int(os.getenv("NWS_STATION_TTL_SECONDS", str(30 * 86400)))
+
 # For NWS weather/alerts we use points near Hilo + Kailua-Kona
 POINTS = {
     "Hilo": (19.707, -155.081),
     "Kailua-Kona": (19.639, -155.996),
 }
 
+# Snapshot field -> (ArcGIS layer, where) to count. Layers on the same
+# FeatureServer are batched into one request, and several filters on one layer
+# (e.g. all vs. active fires) come back from a single outStatistics query.
+ARCGIS_COUNT_QUERIES = {
+    "volcano_sites": (HAWAII_VOLCANO_STATUS_URL, "1=1"),
+    "water_shutoffs": (HAWAII_WATER_SHUTOFF_URL, "1=1"),
+    "water_restrictions": (HAWAII_WATER_RESTRICTION_URL, "1=1"),
+    "fire_events": (HAWAII_FIRE_LOCATIONS_URL, "1=1"),
+    "shelters_layer_count": (HAWAII_SHELTERS_URL, "1=1"),
+    "road_closures_live": (HAWAII_ROAD_CLOSURES_URL, "1=1"),
+    "evacuation_features": (HAWAII_EVACUATIONS_URL, "1=1"),
+    "noaa_metar_sites": (NOAA_METAR_WIND_URL, "1=1"),
+    "nws_watch_warning_count": (NWS_WATCHES_WARNINGS_URL, "1=1"),
+}
+
+# Upstream fan-out: every source is fetched in parallel on a bounded pool,
+# and the whole snapshot gets ONE deadline (sources that miss it fall back)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "16"))
+SNAPSHOT_DEADLINE_SECONDS = float(os.getenv("SNAPSHOT_DEADLINE_SECONDS", "14"))
+
+# The assembled live layer (shared by all 25 event x severity scenarios)
+LIVE_LAYER_TTL_SECONDS = int(os.getenv("LIVE_LAYER_TTL_SECONDS", "15"))
+
+# Shared keep-alive HTTP client (pool sizes are per host)
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))  # extra attempts on connection errors, timeouts, 429/5xx
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))  # seconds, doubled per retry
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Upstream mode: live | record | replay | stub (see fixtures.py)
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live").lower()
+UPSTREAM_STUB_URL = os.getenv("UPSTREAM_STUB_URL", "http://127.0.0.1:8765")
+
 # -----------------------------
-# Tiny TTL cache
+# Bounded LRU + TTL cache (single-flight, stale-while-revalidate)
 # -----------------------------
-CACHE = {}  # key -> (expires_epoch, data)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+
+# Optional persistent backend: set CACHE_DB_PATH to a SQLite file and a
+# restarted worker serves its first requests from disk (then revalidates)
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", "").strip()
+CACHE_DB_RETENTION_SECONDS = int(os.getenv("CACHE_DB_RETENTION_SECONDS", str(7 * 86400)))
+
+NEGATIVE_TTL_SECONDS = int(os.getenv("NEGATIVE_TTL_SECONDS", "60"))
+
+# Background refresher: re-load each live source once REFRESH_AHEAD of its TTL
+# has elapsed, so user requests keep hitting a fresh (or last good) value
+BACKGROUND_REFRESH = os.getenv("BACKGROUND_REFRESH", "1") == "1"
+REFRESH_AHEAD = float(os.getenv("REFRESH_AHEAD", "0.8"))
+REFRESH_TICK_SECONDS = float(os.getenv("REFRESH_TICK_SECONDS", "5"))
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "8"))  # own pool: slow refreshes never queue ahead of a snapshot
+
+# key -> {"expires": epoch, "data": ..., "stored": epoch, "ok": bool, "validators": dict|None}
+# least recently used first; "ok" is False for a cached fallback after a failed load;
+# "validators" holds the ETag / Last-Modified the upstream sent with the data
+CACHE = OrderedDict()
+CACHE_LOCK = threading.RLock()
+CACHE_STATS = {
+    "hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "expired": 0,
+    "coalesced": 0, "refreshes": 0, "refresh_errors": 0, "not_modified": 0, "disk_hits": 0,
+}
+INFLIGHT = {}     # key -> {"done": Event, "data": ..., "error": ...}
+REFRESHABLE = {}  # key -> {"loader": fn, "ttl": s, "retry_at": epoch, "last_error": str}
+MISSING = object()  # lets 0 / [] / None be cached values
+SOURCE_TRACE = threading.local()  # cache reads made by the current fetch job
+
+# A loader may return Fetched(data, validators) to store HTTP validators with
+# the entry, or raise NotModified when the upstream answered 304
+Fetched = namedtuple("Fetched", ["data", "validators"])
+
+class NotModified(Exception):
+    """Upstream answered 304 to validators taken from rec (the record the caller held)."""
+    def __init__(self, url: str, rec: dict):
+        super().__init__(url)
+        self.rec = rec
+
+def cache_lookup(key: str, stale_ok: bool = False):
+    """
+    Returns the cache record or None. Caller must hold CACHE_LOCK.
+    Expired records are dropped unless stale_ok (stale-while-revalidate reads).
+    """
+    rec = CACHE.get(key)
+    if rec is None:
+        CACHE_STATS["misses"] += 1
+        return None
+    if time.time() >= rec["expires"]:
+        if not stale_ok:
+            del CACHE[key]
+            CACHE_STATS["expired"] += 1
+            CACHE_STATS["misses"] += 1
+            return None
+        CACHE_STATS["stale_hits"] += 1
+    else:
+        CACHE_STATS["hits"] += 1
+    CACHE.move_to_end(key)
+    return rec
 
 def cache_get(key: str):
-    rec = CACHE.get(key)
-    if not rec:
+    with CACHE_LOCK:
+        rec = cache_lookup(key)
+    return None if rec is None else rec["data"]
+
+def cache_set(key: str, data, ttl_seconds: int = 120, ok: bool = True, validators=None):
+    now = time.time()
+    rec = {"expires": now + ttl_seconds, "data": data, "stored": now, "ok": ok, "validators": validators}
+    with CACHE_LOCK:
+        CACHE[key] = rec
+        CACHE.move_to_end(key)
+        while len(CACHE) > CACHE_MAX_ENTRIES:
+            CACHE.popitem(last=False)
+            CACHE_STATS["evictions"] += 1
+    disk_cache_put(key, rec)
+
+def cache_touch(key: str, ttl_seconds: int, held: dict):
+    """
+    Upstream said 304 to the validators of held: keep its parsed data and
+    validators, restart the TTL. If held was evicted meanwhile, it goes back in.
+    """
+    with CACHE_LOCK:
+        CACHE_STATS["not_modified"] += 1
+        rec = CACHE.get(key)
+        if rec is not None and rec.get("validators") == held["validators"]:
+            now = time.time()
+            rec.update(expires=now + ttl_seconds, stored=now, ok=True)
+            CACHE.move_to_end(key)
+        else:
+            rec = None
+    if rec is None:
+        cache_set(key, held["data"], ttl_seconds=ttl_seconds, validators=held["validators"])
+        return held["data"]
+    disk_cache_put(key, rec)
+    return rec["data"]
+
+def cache_promote(key: str, stale_ok: bool = False):
+    """
+    Memory miss: pull the persisted record (if any) into memory.
+    Returns the record or None. Must be called WITHOUT CACHE_LOCK held.
+    """
+    rec = disk_cache_get(key)
+    if rec is None or (not stale_ok and time.time() >= rec["expires"]):
+        return None
+    with CACHE_LOCK:
+        if key not in CACHE:
+            CACHE[key] = rec
+            CACHE_STATS["disk_hits"] += 1
+        return CACHE[key]
+
+def held_record(key: str):
+    """The good, validator-carrying record cached under key, or None. A 304 refers to this record."""
+    with CACHE_LOCK:
+        rec = CACHE.get(key)
+    if rec is None or not rec["ok"] or not rec.get("validators"):
+        return None
+    return rec
+
+def conditional_headers(rec) -> dict:
+    """If-None-Match / If-Modified-Since from a held_record() (None: unconditional)."""
+    if rec is None:
+        return {}
+    v = rec["validators"]
+    headers = {}
+    if v.get("etag"):
+        headers["If-None-Match"] = v["etag"]
+    if v.get("last_modified"):
+        headers["If-Modified-Since"] = v["last_modified"]
+    return headers
+
+def join_flight(key: str):
+    """Returns (flight, is_leader). Caller must hold CACHE_LOCK."""
+    flight = INFLIGHT.get(key)
+    if flight is not None:
+        CACHE_STATS["coalesced"] += 1
+        return flight, False
+    flight = {"done": threading.Event(), "data": None, "error": None}
+    INFLIGHT[key] = flight
+    return flight, True
+
+def finish_flight(key: str, flight: dict, leader: bool, loader, ttl_seconds: int):
+    """Leader runs loader() and caches it; followers wait for the leader's result."""
+    if not leader:
+        flight["done"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["data"]
+
+    try:
+        data = shared_load(key, loader, ttl_seconds)
+        flight["data"] = data
+        return data
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with CACHE_LOCK:
+            INFLIGHT.pop(key, None)
+        flight["done"].set()
+
+def run_loader(key: str, loader, ttl_seconds: int):
+    try:
+        data, validators = loader(), None
+        if isinstance(data, Fetched):
+            data, validators = data
+        cache_set(key, data, ttl_seconds=ttl_seconds, validators=validators)
+        return data
+    except NotModified as e:
+        return cache_touch(key, ttl_seconds, e.rec)
+
+def shared_load(key: str, loader, ttl_seconds: int):
+    """
+    Load key once per host, not once per worker (needs CACHE_DB_PATH):
+    - another worker stored a newer value recently: adopt it, no upstream call
+    - another worker holds the load lease: wait for its value
+    - otherwise take the lease, load, write through to disk
+    Without a shared DB this is just run_loader().
+    """
+    with CACHE_LOCK:
+        mem = CACHE.get(key)
+    since = mem["stored"] if mem else 0
+
+    rec = shared_newer(key, since, ttl_seconds)
+    if rec is None and not acquire_lease(key):
+        rec = wait_for_shared(key, since)
+    if rec is not None:
+        return adopt_record(key, rec)
+
+    try:
+        return run_loader(key, loader, ttl_seconds)
+    finally:
+        release_lease(key)
+
+def cache_get_or_load(key: str, loader, ttl_seconds: int = 120):
+    """
+    Cached value for key, or loader() stored for ttl_seconds.
+    Single-flight: concurrent callers for the same missing key wait for the
+    one in-flight loader instead of each hitting the upstream. If the loader
+    raises, every waiter gets the exception and nothing is cached.
+    """
+    with CACHE_LOCK:
+        rec = cache_lookup(key)
+    if rec is None:
+        rec = cache_promote(key)
+    if rec is not None:
+        return rec["data"]
+
+    with CACHE_LOCK:
+        rec = CACHE.get(key)  # someone may have loaded it meanwhile
+        if rec is not None and time.time() < rec["expires"]:
+            return rec["data"]
+        flight, leader = join_flight(key)
+    return finish_flight(key, flight, leader, loader, ttl_seconds)
+
+def note_source_read(key: str, rec: dict):
+    reads = getattr(SOURCE_TRACE, "reads", None)
+    if reads is not None:
+        reads.append({"key": key, "stored": rec["stored"], "expires": rec["expires"], "ok": rec["ok"]})
+
+def cache_get_swr(key: str, loader, ttl_seconds: int = 120, fallback=MISSING):
+    """
+    Stale-while-revalidate read for a live data source.
+    - fresh hit: returned as-is
+    - stale hit: the last good value is returned now and a background
+      refresh is queued (the caller never waits on the network)
+    - cold miss: loads once (single-flight); if that fails and a fallback is
+      given, the fallback is cached for NEGATIVE_TTL_SECONDS and returned
+    The key is registered with the background refresher, which re-loads it
+    before it expires.
+    """
+    ensure_refresher()
+    with CACHE_LOCK:
+        meta = REFRESHABLE.setdefault(key, {"retry_at": 0, "last_error": None})
+        meta["loader"] = loader
+        meta["ttl"] = ttl_seconds
+        rec = cache_lookup(key, stale_ok=True)
+    if rec is None:
+        rec = cache_promote(key, stale_ok=True)  # warm restart: last value from disk
+    if rec is None and getattr(SOURCE_TRACE, "cache_only", False):
+        raise DeadlineExceeded()  # peek_cached: cold miss, and no time left to load
+    if rec is None:
+        with CACHE_LOCK:
+            rec = CACHE.get(key)
+            if rec is None:
+                flight, leader = join_flight(key)
+
+    if rec is not None:
+        if time.time() >= rec["expires"]:
+            schedule_refresh(key)
+        note_source_read(key, rec)
+        return rec["data"]
+
+    try:
+        finish_flight(key, flight, leader, loader, ttl_seconds)
+    except Exception as e:
+        meta["last_error"] = repr(e)
+        meta["retry_at"] = time.time() + min(ttl_seconds, NEGATIVE_TTL_SECONDS)
+        if fallback is MISSING:
+            raise
+        with CACHE_LOCK:
+            missing = key not in CACHE
+        if missing:
+            cache_set(key, fallback, ttl_seconds=min(ttl_seconds, NEGATIVE_TTL_SECONDS), ok=False)
+    with CACHE_LOCK:
+        rec = CACHE[key]
+    note_source_read(key, rec)
+    return rec["data"]
+
+def schedule_refresh(key: str):
+    with CACHE_LOCK:
+        if key in INFLIGHT or key not in REFRESHABLE:
+            return
+        flight, _ = join_flight(key)
+    try:
+        REFRESH_POOL.submit(refresh_key, key, flight)
+    except RuntimeError:  # pool shut down (interpreter exit): don't leave followers waiting
+        with CACHE_LOCK:
+            INFLIGHT.pop(key, None)
+        flight["error"] = DeadlineExceeded()
+        flight["done"].set()
+
+def refresh_key(key: str, flight: dict):
+    """
+    Background re-load of one registered key. On failure the last good value
+    stays cached (and keeps being served) and we retry after a short delay.
+    """
+    meta = REFRESHABLE[key]
+    try:
+        finish_flight(key, flight, True, meta["loader"], meta["ttl"])
+        meta["last_error"] = None
+        CACHE_STATS["refreshes"] += 1
+    except Exception as e:
+        meta["last_error"] = repr(e)
+        meta["retry_at"] = time.time() + min(meta["ttl"], NEGATIVE_TTL_SECONDS)
+        CACHE_STATS["refresh_errors"] += 1
+
+def refresher_loop():
+    while True:
+        time.sleep(REFRESH_TICK_SECONDS)
+        now = time.time()
+        due = []
+        with CACHE_LOCK:
+            for key, meta in REFRESHABLE.items():
+                rec = CACHE.get(key)
+                if now < meta["retry_at"]:
+                    continue
+                if rec is None or not rec["ok"] or now >= rec["stored"] + meta["ttl"] * REFRESH_AHEAD:
+                    due.append(key)
+        for key in due:
+            schedule_refresh(key)
+
+REFRESHER = {"thread": None}
+REFRESHER_LOCK = threading.Lock()
+REFRESH_POOL = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="hiema-refresh")
+
+def ensure_refresher():
+    if not BACKGROUND_REFRESH or REFRESHER["thread"] is not None:
+        return
+    with REFRESHER_LOCK:
+        if REFRESHER["thread"] is None:
+            t = threading.Thread(target=refresher_loop, name="hiema-refresher", daemon=True)
+            t.start()
+            REFRESHER["thread"] = t
+
+# -----------------------------
+# Persistent cache backend (optional, SQLite in WAL mode)
+# -----------------------------
+# Same keys/records as CACHE; values are stored as JSON. Only good values are
+# written (never a cached fallback). One connection per thread.
+DISK = threading.local()
+DISK_PRUNED = {"done": False}
+
+def disk_db() -> sqlite3.Connection:
+    conn = getattr(DISK, "conn", None)
+    if conn is None or DISK.pid != os.getpid():  # never reuse a connection across fork
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, expires REAL, stored REAL, ok INTEGER, validators TEXT, data TEXT)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, until REAL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS login_failures (key TEXT PRIMARY KEY, count INTEGER, locked_until REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS exports ("
+            " id TEXT PRIMARY KEY, status TEXT, event TEXT, severity INTEGER, encrypted INTEGER, content TEXT,"
+            " created REAL, started REAL, finished REAL, shared INTEGER, error TEXT, pdf BLOB)"
+        )
+        DISK.conn = conn
+        DISK.pid = os.getpid()
+        if not DISK_PRUNED["done"]:
+            DISK_PRUNED["done"] = True
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time() - CACHE_DB_RETENTION_SECONDS,))
+    return conn
+
+def disk_cache_get(key: str):
+    if not CACHE_DB_PATH:
+        return None
+    try:
+        row = disk_db().execute(
+            "SELECT expires, stored, ok, validators, data FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "expires": row[0],
+            "stored": row[1],
+            "ok": bool(row[2]),
+            "validators": json.loads(row[3]) if row[3] else None,
+            "data": json.loads(row[4]),
+        }
+    except Exception:
         return None
-    exp, data = rec
-    return data if time.time() < exp else None
 
-def cache_set(key: str, data, ttl_seconds: int = 120):
-    CACHE[key] = (time.time() + ttl_seconds, data)
+def disk_cache_put(key: str, rec: dict):
+    if not CACHE_DB_PATH or not rec["ok"]:
+        return
+    try:
+        disk_db().execute(
+            "INSERT OR REPLACE INTO cache (key, expires, stored, ok, validators, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key, rec["expires"], rec["stored"], 1,
+                json.dumps(rec["validators"]) if rec["validators"] else None,
+                json.dumps(rec["data"]),
+            ),
+        )
+    except Exception:
+        pass  # not JSON-able, or disk trouble: the memory cache still works
+
+# -----------------------------
+# Cross-worker coordination (same SQLite file on one host)
+# -----------------------------
+# Every worker pointed at the same CACHE_DB_PATH shares cached upstream data,
+# a load lease per key (so N workers make one set of upstream calls) and the
+# login lockout counters. Each statement below is a single atomic write.
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", "20"))
+LEASE_POLL_SECONDS = 0.1
+
+def worker_id() -> str:
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+def acquire_lease(key: str) -> bool:
+    if not CACHE_DB_PATH:
+        return True
+    now = time.time()
+    try:
+        cur = disk_db().execute(
+            "INSERT INTO leases (key, owner, until) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, until = excluded.until "
+            "WHERE leases.until < ?",
+            (key, worker_id(), now + LEASE_SECONDS, now),
+        )
+        return cur.rowcount == 1
+    except Exception:
+        return True  # can't coordinate: load it ourselves
+
+def release_lease(key: str):
+    if not CACHE_DB_PATH:
+        return
+    try:
+        disk_db().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, worker_id()))
+    except Exception:
+        pass
+
+def shared_newer(key: str, since: float, ttl_seconds: int):
+    """A record another worker stored after `since` that is not yet due for refresh."""
+    rec = disk_cache_get(key)
+    if rec is None or rec["stored"] <= since:
+        return None
+    if time.time() >= rec["stored"] + ttl_seconds * REFRESH_AHEAD:
+        return None
+    return rec
+
+def wait_for_shared(key: str, since: float):
+    """Another worker holds the lease: poll for its result until the lease would expire."""
+    give_up = time.time() + LEASE_SECONDS
+    while time.time() < give_up:
+        time.sleep(LEASE_POLL_SECONDS)
+        rec = disk_cache_get(key)
+        if rec is not None and rec["stored"] > since:
+            return rec
+    return None
+
+def adopt_record(key: str, rec: dict):
+    with CACHE_LOCK:
+        CACHE[key] = rec
+        CACHE.move_to_end(key)
+        CACHE_STATS["disk_hits"] += 1
+    return rec["data"]
+
+def cache_stats() -> dict:
+    with CACHE_LOCK:
+        return {
+            **CACHE_STATS,
+            "size": len(CACHE),
+            "max_entries": CACHE_MAX_ENTRIES,
+            "inflight": len(INFLIGHT),
+            "refreshable": len(REFRESHABLE),
+            "persistent": bool(CACHE_DB_PATH),
+        }
 
 # -----------------------------
 # Login lockout (demo-safe)
 # -----------------------------
-FAILED = {}  # key -> {"count": int, "locked_until": float}
+# Counters live in the shared SQLite file when CACHE_DB_PATH is set, so a
+# client can't dodge the lockout by landing on a different worker
+FAILED = {}  # in-process fallback: key -> {"count": int, "locked_until": float}
+FAILED_LOCK = threading.Lock()
 MAX_ATTEMPTS = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
 LOCKOUT_SECONDS = int(os.getenv("LOCKOUT_SECONDS", "300"))
 
@@ -148,25 +690,193 @@ def client_key() -> str:
     ua = request.headers.get("User-Agent", "na")
     return f"{ip}|{ua[:60]}"
 
+def locked_until(key: str) -> float:
+    if CACHE_DB_PATH:
+        try:
+            row = disk_db().execute("SELECT locked_until FROM login_failures WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else 0
+        except Exception:
+            pass
+    with FAILED_LOCK:
+        return FAILED.get(key, {}).get("locked_until", 0)
+
 def is_locked(key: str):
-    rec = FAILED.get(key)
-    if not rec:
-        return False, 0
     now = time.time()
-    until = rec.get("locked_until", 0)
+    until = locked_until(key)
     if until > now:
         return True, int(until - now)
-    rec["locked_until"] = 0
     return False, 0
 
 def register_fail(key: str):
-    rec = FAILED.setdefault(key, {"count": 0, "locked_until": 0})
-    rec["count"] += 1
-    if rec["count"] >= MAX_ATTEMPTS:
-        rec["locked_until"] = time.time() + LOCKOUT_SECONDS
+    lock_at = time.time() + LOCKOUT_SECONDS
+    if CACHE_DB_PATH:
+        try:
+            disk_db().execute(
+                "INSERT INTO login_failures (key, count, locked_until) VALUES (?, 1, CASE WHEN 1 >= ? THEN ? ELSE 0 END) "
+                "ON CONFLICT(key) DO UPDATE SET count = count + 1, "
+                "locked_until = CASE WHEN count + 1 >= ? THEN ? ELSE locked_until END",
+                (key, MAX_ATTEMPTS, lock_at, MAX_ATTEMPTS, lock_at),
+            )
+            return
+        except Exception:
+            pass
+    with FAILED_LOCK:
+        rec = FAILED.setdefault(key, {"count": 0, "locked_until": 0})
+        rec["count"] += 1
+        if rec["count"] >= MAX_ATTEMPTS:
+            rec["locked_until"] = lock_at
 
 def clear_fails(key: str):
-    FAILED[key] = {"count": 0, "locked_until": 0}
+    if CACHE_DB_PATH:
+        try:
+            disk_db().execute("DELETE FROM login_failures WHERE key = ?", (key,))
+        except Exception:
+            pass
+    with FAILED_LOCK:
+        FAILED.pop(key, None)
+
+# -----------------------------
+# Request timing (Server-Timing, structured logs, sampling profiler)
+# -----------------------------
+# span("name") records into the current request's span list (a no-op outside
+# a request). Every response gets a Server-Timing header and, with
+# TIMING_LOG=1, one JSON log line. PROFILE_SLOWEST=N turns on a stack sampler
+# and keeps folded stacks (flamegraph.pl / speedscope input) for the N
+# slowest requests seen, in PROFILE_DIR.
+TIMING_LOG = os.getenv("TIMING_LOG", "1") == "1"
+PROFILE_SLOWEST = int(os.getenv("PROFILE_SLOWEST", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(app.root_path, "profiles"))
+
+TIMING = threading.local()  # .spans for the request running on this thread
+TIMING_LOGGER = logging.getLogger("hiema.timing")
+if TIMING_LOG and not TIMING_LOGGER.handlers:
+    TIMING_LOGGER.addHandler(logging.StreamHandler())
+    TIMING_LOGGER.setLevel(logging.INFO)
+    TIMING_LOGGER.propagate = False
+
+PROFILING = {}       # request thread id -> {folded stack: samples}
+PROFILE_OWNERS = {}  # fetch-pool thread id -> request thread id it is working for
+PROFILE_KEPT = []    # min-heap of (ms, file path) for the slowest requests
+PROFILE_LOCK = threading.Lock()
+PROFILER = {"thread": None}
+
+@contextmanager
+def span(name: str):
+    spans = getattr(TIMING, "spans", None)
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+def add_span(name: str, seconds: float):
+    spans = getattr(TIMING, "spans", None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+def server_timing(spans: list, total: float) -> str:
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    totals["total"] = total
+    parts = []
+    for name, seconds in totals.items():
+        token = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+        parts.append(f'{token};desc="{name}";dur={seconds * 1000:.1f}')
+    return ", ".join(parts)
+
+def folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def profiler_loop():
+    while True:
+        time.sleep(PROFILE_INTERVAL_MS / 1000.0)
+        frames = sys._current_frames()
+        with PROFILE_LOCK:
+            targets = {tid: tid for tid in PROFILING}
+            targets.update({tid: owner for tid, owner in PROFILE_OWNERS.items() if owner in PROFILING})
+            for tid, owner in targets.items():
+                frame = frames.get(tid)
+                if frame is not None:
+                    stack = folded_stack(frame)
+                    samples = PROFILING[owner]
+                    samples[stack] = samples.get(stack, 0) + 1
+
+def ensure_profiler():
+    if PROFILER["thread"] is not None:
+        return
+    with PROFILE_LOCK:
+        if PROFILER["thread"] is None:
+            t = threading.Thread(target=profiler_loop, name="hiema-profiler", daemon=True)
+            t.start()
+            PROFILER["thread"] = t
+
+def keep_profile(ms: float, samples: dict):
+    """Writes the request's folded stacks if it is among the PROFILE_SLOWEST slowest so far."""
+    if not samples:
+        return
+    with PROFILE_LOCK:
+        if len(PROFILE_KEPT) >= PROFILE_SLOWEST and ms <= PROFILE_KEPT[0][0]:
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{request.path.strip('/').replace('/', '_') or 'root'}_{int(ms)}ms.folded"
+        path = os.path.join(PROFILE_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(samples.items()):
+                f.write(f"{stack} {count}\n")
+        heapq.heappush(PROFILE_KEPT, (ms, path))
+        if len(PROFILE_KEPT) > PROFILE_SLOWEST:
+            _, dropped = heapq.heappop(PROFILE_KEPT)
+            try:
+                os.remove(dropped)
+            except OSError:
+                pass
+
+@app.before_request
+def timing_start():
+    TIMING.spans = []
+    TIMING.start = time.perf_counter()
+    if PROFILE_SLOWEST > 0 and not request.path.startswith("/static"):
+        ensure_profiler()
+        with PROFILE_LOCK:
+            PROFILING[threading.get_ident()] = {}
+
+@app.after_request
+def timing_finish(resp):
+    spans = getattr(TIMING, "spans", None)
+    if spans is None:
+        return resp
+    total = time.perf_counter() - TIMING.start
+    resp.headers["Server-Timing"] = server_timing(spans, total)
+    if TIMING_LOG:
+        TIMING_LOGGER.info(json.dumps({
+            "event": "request",
+            "method": request.method,
+            "path": request.path,
+            "status": resp.status_code,
+            "ms": round(total * 1000, 1),
+            "spans": [{"name": n, "ms": round(sec * 1000, 1)} for n, sec in spans],
+        }))
+    if PROFILE_SLOWEST > 0:
+        with PROFILE_LOCK:
+            samples = PROFILING.pop(threading.get_ident(), None)
+        keep_profile(total * 1000, samples)
+    return resp
+
+@app.teardown_request
+def timing_cleanup(exc):
+    TIMING.spans = None
+    with PROFILE_LOCK:
+        PROFILING.pop(threading.get_ident(), None)
 
 # -----------------------------
 # Basic security headers
@@ -196,18 +906,292 @@ def require_login():
         return
     if path in ("/login",):
         return
+    # scrapers can't log in: /metrics also accepts "Authorization: Bearer $METRICS_TOKEN"
+    if path == "/metrics" and METRICS_TOKEN and secrets.compare_digest(
+        request.headers.get("Authorization", "").encode("utf-8"), f"Bearer {METRICS_TOKEN}".encode("utf-8")
+    ):  # bytes: compare_digest rejects non-ASCII str, and headers can carry any latin-1 byte
+        return
     # allow api snapshot to be protected too (keeps app simple)
     if not session.get("logged_in"):
         return redirect(url_for("login"))
 
+# -----------------------------
+# Metrics (Prometheus text format at /metrics)
+# -----------------------------
+# Counters and fixed-bucket histograms kept in plain dicts: recording is one
+# lock + a bisect. Values are per process (scrape each worker). Cache, render,
+# push, export and breaker numbers are read from their own stats at scrape time.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "").strip()
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_HELP = {
+    "hiema_upstream_request_seconds": ("histogram", "Upstream HTTP call latency by host."),
+    "hiema_upstream_errors_total": ("counter", "Upstream call failures by host and kind."),
+    "hiema_source_fetch_seconds": ("histogram", "Time for each snapshot source job, cache included."),
+    "hiema_snapshot_stage_seconds": ("histogram", "Snapshot build duration by stage."),
+    "hiema_pdf_render_seconds": ("histogram", "PDF render time (render cache misses only)."),
+    "hiema_login_events_total": ("counter", "Login outcomes, including lockouts."),
+}
+COUNTERS = {}    # (name, labels) -> float
+HISTOGRAMS = {}  # (name, labels) -> {"buckets": [...], "sum": float, "count": int}
+METRICS_LOCK = threading.Lock()
+
+def inc(name: str, amount: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with METRICS_LOCK:
+        COUNTERS[key] = COUNTERS.get(key, 0) + amount
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    i = bisect.bisect_left(METRIC_BUCKETS, seconds)
+    with METRICS_LOCK:
+        h = HISTOGRAMS.get(key)
+        if h is None:
+            h = HISTOGRAMS[key] = {"buckets": [0] * len(METRIC_BUCKETS), "sum": 0.0, "count": 0}
+        if i < len(METRIC_BUCKETS):
+            h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+def metric_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{label_value(v)}"' for k, v in pairs) + "}"
+
+def label_value(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def metrics_text() -> str:
+    with METRICS_LOCK:
+        counters = dict(COUNTERS)
+        histograms = {k: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for k, h in HISTOGRAMS.items()}
+
+    lines = []
+    for name, (kind, text) in METRIC_HELP.items():
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{metric_labels(labels)} {value:g}")
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            running = 0
+            for le, c in zip(METRIC_BUCKETS, h["buckets"]):
+                running += c
+                lines.append(f"{name}_bucket{metric_labels(labels, [('le', f'{le:g}')])} {running}")
+            lines.append(f"{name}_bucket{metric_labels(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{name}_sum{metric_labels(labels)} {h['sum']:.6f}")
+            lines.append(f"{name}_count{metric_labels(labels)} {h['count']}")
+
+    def scraped(name, text, values, kind="gauge"):
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{metric_labels(labels)} {value:g}")
+
+    cs = cache_stats()
+    scraped("hiema_cache_events_total", "Data cache events since start.",
+          [([("event", k)], cs[k]) for k in ("hits", "stale_hits", "misses", "evictions", "expired",
+                                             "coalesced", "refreshes", "refresh_errors", "not_modified", "disk_hits")],
+          kind="counter")
+    scraped("hiema_cache_entries", "Entries in the data cache.", [([], cs["size"])])
+    rs = render_stats()
+    scraped("hiema_render_cache_events_total", "Chart/PDF render cache events since start.",
+          [([("event", k)], rs[k]) for k in ("hits", "misses", "evictions")], kind="counter")
+    scraped("hiema_render_cache_bytes", "Bytes held by the render cache.", [([], rs["bytes"])])
+    scraped("hiema_push_clients", "Connected SSE dashboards.", [([], PUSH_STATS["clients"])])
+    scraped("hiema_export_jobs_pending", "Queued or running PDF export jobs.", [([], export_pending())])
+    scraped("hiema_breaker_open", "1 if the upstream host's circuit breaker is open or half-open.",
+          [([("host", host)], 0 if b["state"] == "closed" else 1) for host, b in sorted(breaker_stats().items())])
+    return "\n".join(lines) + "\n"
+
 # -----------------------------
 # HTTP helpers
 # -----------------------------
+def build_http_session() -> requests.Session:
+    """
+    One pooled session for every upstream call, so repeat calls to the same
+    host (services1.arcgis.com, api.weather.gov, ...) reuse a warm TCP+TLS
+    connection. pool_block keeps us at HTTP_POOL_PER_HOST sockets per host.
+    No adapter-level retries: http_get retries itself so every attempt is
+    seen by the circuit breaker and paid for out of the call's time budget.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_PER_HOST,
+        max_retries=0,
+        pool_block=True,
+    )
+    s = requests.Session()
+    s.headers.update(UA)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+HTTP = build_http_session()
+
+# -----------------------------
+# Circuit breakers (per upstream host) + deadline budget
+# -----------------------------
+# closed -> open after BREAKER_FAILURES consecutive failures (errors, timeouts,
+# 5xx/429). While open, calls fail immediately. After BREAKER_COOLDOWN_SECONDS
+# one probe call is let through (half-open): success closes, failure re-opens.
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = int(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+BREAKERS = {}  # host -> {"state", "failures", "opened_at", "probing", "opens", "fast_fails"}
+BREAKERS_LOCK = threading.Lock()
+
+class CircuitOpen(Exception):
+    """Upstream host is failing; call skipped without touching the network."""
+
+class DeadlineExceeded(Exception):
+    """The snapshot's fetch budget ran out before this call could start."""
+
+def breaker_before(host: str):
+    with BREAKERS_LOCK:
+        b = BREAKERS.setdefault(host, {
+            "state": "closed", "failures": 0, "opened_at": 0.0, "probing": False, "opens": 0, "fast_fails": 0,
+        })
+        if b["state"] == "open" and time.time() - b["opened_at"] >= BREAKER_COOLDOWN_SECONDS:
+            b["state"] = "half_open"
+        if b["state"] == "open" or (b["state"] == "half_open" and b["probing"]):
+            b["fast_fails"] += 1
+            raise CircuitOpen(host)
+        if b["state"] == "half_open":
+            b["probing"] = True
+
+def breaker_after(host: str, ok: bool):
+    with BREAKERS_LOCK:
+        b = BREAKERS[host]
+        b["probing"] = False
+        if ok:
+            b["state"] = "closed"
+            b["failures"] = 0
+            return
+        b["failures"] += 1
+        if b["state"] == "half_open" or b["failures"] >= BREAKER_FAILURES:
+            if b["state"] != "open":
+                b["opens"] += 1
+            b["state"] = "open"
+            b["opened_at"] = time.time()
+
+def breaker_stats() -> dict:
+    with BREAKERS_LOCK:
+        return {host: dict(b) for host, b in BREAKERS.items()}
+
+def call_budget(timeout: float, call_deadline: float) -> float:
+    """
+    Timeout for the next attempt: what is left of this call's own budget
+    (call_deadline), capped by what is left of the current snapshot's deadline.
+    """
+    remaining = call_deadline - time.time()
+    deadline = getattr(SOURCE_TRACE, "deadline", None)
+    if deadline is not None:  # None: background refresh, no snapshot is waiting on us
+        remaining = min(remaining, deadline - time.time())
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, remaining)
+
+def upstream_error_kind(e: Exception) -> str:
+    """
+    "timeout" or "error" for the metrics. When urllib3 retries are involved a
+    timeout arrives as ConnectionError(MaxRetryError(reason=ReadTimeoutError)).
+    """
+    if isinstance(e, requests.Timeout):
+        return "timeout"
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    if isinstance(reason, (ReadTimeoutError, ConnectTimeoutError)):
+        return "timeout"
+    return "error"
+
+def retry_delay(attempt: int, r=None) -> float:
+    """Backoff before retry number attempt+1; honours a numeric Retry-After."""
+    retry_after = r.headers.get("Retry-After", "") if r is not None else ""
+    if retry_after.strip().isdigit():
+        return float(retry_after)
+    return HTTP_BACKOFF * (2 ** attempt)
+
+def upstream_get(url: str, params, headers, timeout) -> requests.Response:
+    if UPSTREAM_MODE == "replay":
+        return fixtures.replay(url, params=params, headers=headers, timeout=timeout)
+    if UPSTREAM_MODE == "stub":
+        return HTTP.get(fixtures.stub_url(UPSTREAM_STUB_URL, url, params), headers=headers, timeout=timeout)
+    r = HTTP.get(url, params=params, headers=headers, timeout=timeout)
+    if UPSTREAM_MODE == "record" and r.status_code != 304:
+        fixtures.record(url, params, r)
+    return r
+
+def http_get(url: str, params=None, timeout=12, headers=None) -> requests.Response:
+    """
+    GET with up to HTTP_RETRIES retries. timeout bounds the whole call
+    (attempts + backoff), and each attempt counts against the host's breaker.
+    """
+    if getattr(SOURCE_TRACE, "cache_only", False):
+        raise DeadlineExceeded()  # peek_cached never touches the network
+    host = urlparse(url).netloc
+    call_deadline = time.time() + timeout
+    attempt = 0
+    while True:
+        try:
+            attempt_timeout = call_budget(timeout, call_deadline)
+            breaker_before(host)
+        except CircuitOpen:
+            inc("hiema_upstream_errors_total", host=host, kind="circuit_open")
+            raise
+        except DeadlineExceeded:
+            inc("hiema_upstream_errors_total", host=host, kind="deadline")
+            raise
+
+        start = time.perf_counter()
+        try:
+            r = upstream_get(url, params, headers, attempt_timeout)
+        except Exception as e:
+            breaker_after(host, False)
+            inc("hiema_upstream_errors_total", host=host, kind=upstream_error_kind(e))
+            retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+            if not retryable or attempt >= HTTP_RETRIES or time.time() + retry_delay(attempt) >= call_deadline:
+                raise
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+            continue
+        finally:
+            observe("hiema_upstream_request_seconds", time.perf_counter() - start, host=host)
+
+        ok = r.status_code < 500 and r.status_code != 429
+        if not ok:
+            inc("hiema_upstream_errors_total", host=host, kind=f"http_{r.status_code}")
+        breaker_after(host, ok)
+        delay = retry_delay(attempt, r)
+        if r.status_code not in HTTP_RETRY_STATUSES or attempt >= HTTP_RETRIES or time.time() + delay >= call_deadline:
+            return r
+        time.sleep(delay)
+        attempt += 1
+
 def http_get_json(url: str, params=None, timeout=12):
-    r = requests.get(url, params=params, headers=UA, timeout=timeout)
+    r = http_get(url, params=params, timeout=timeout)
     r.raise_for_status()
     return r.json()
 
+def http_get_validated(url: str, key: str, params=None, timeout=12) -> requests.Response:
+    """
+    Conditional GET for a polled upstream whose parsed result is cached under
+    key: sends the stored validators and raises NotModified on a 304, so the
+    cache layer just restarts the TTL instead of downloading and re-parsing.
+    """
+    held = held_record(key)
+    r = http_get(url, params=params, timeout=timeout, headers=conditional_headers(held))
+    if r.status_code == 304:
+        if held is None:
+            raise RuntimeError(f"304 from {url} without a conditional request")  # a miss, not a touch
+        raise NotModified(url, held)
+    r.raise_for_status()
+    return r
+
+def response_validators(r: requests.Response) -> dict:
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
 def safe_int(x, default=0):
     try:
         return int(x)
@@ -226,11 +1210,15 @@ def get_jurisdiction_population() -> tuple[int, str]:
     REAL population from Census ACS 2024 1-year:
     Hawaii County = state:15 county:001, variable B01003_001E
     """
-    ck = "pop:hawaii_county_acs2024"
-    cached = cache_get(ck)
-    if cached:
-        return cached["pop"], cached["source"]
+    rec = cache_get_swr(
+        "pop:hawaii_county_acs2024",
+        load_jurisdiction_population,
+        ttl_seconds=86400,
+        fallback={"pop": FALLBACK_POP_2024, "source": FALLBACK_POP_SOURCE},
+    )
+    return rec["pop"], rec["source"]
 
+def load_jurisdiction_population() -> dict:
     params = {
         "get": "NAME,B01003_001E",
         "for": "county:001",
@@ -239,16 +1227,12 @@ def get_jurisdiction_population() -> tuple[int, str]:
     if CENSUS_API_KEY:
         params["key"] = CENSUS_API_KEY
 
-    try:
-        data = http_get_json(CENSUS_ACS_URL, params=params, timeout=12)
-        row = data[1]
-        name = row[0]
-        pop = int(float(row[1]))
-        source = f"US Census ACS 2024 (acs1) B01003_001E – {name}"
-        cache_set(ck, {"pop": pop, "source": source}, ttl_seconds=86400)
-        return pop, source
-    except Exception:
-        return FALLBACK_POP_2024, FALLBACK_POP_SOURCE
+    data = http_get_json(CENSUS_ACS_URL, params=params, timeout=12)
+    row = data[1]
+    name = row[0]
+    pop = int(float(row[1]))
+    source = f"US Census ACS 2024 (acs1) B01003_001E – {name}"
+    return {"pop": pop, "source": source}
 
 # -----------------------------
 # Data: FEMA count
@@ -259,44 +1243,143 @@ def get_fema_disaster_count_for_state(state_abbr: str) -> int:
         return 0
 
     ck = f"fema_count:{state_abbr}"
-    cached = cache_get(ck)
-    if cached is not None:
-        return cached
+    return cache_get_swr(ck, lambda: load_fema_disaster_count(state_abbr), ttl_seconds=3600, fallback=0)
 
+def load_fema_disaster_count(state_abbr: str) -> int:
+    """
+    Ask OpenFEMA for the count only ($count=true, one tiny record back).
+    If the response has no count metadata, page through a one-field
+    $select until a short page, so the total is still exact past 1000.
+    """
     flt = f"state eq '{state_abbr}' and incidentBeginDate ge '2000-01-01'"
-    params = {"$filter": flt, "$top": 1000}
 
-    try:
+    params = {"$filter": flt, "$count": "true", "$top": 1, "$select": "id"}
+    data = http_get_json(FEMA_API_URL, params=params, timeout=12)
+    count = (data.get("metadata") or {}).get("count")
+    if isinstance(count, int):
+        return count
+
+    total = 0
+    for page in range(FEMA_MAX_PAGES):
+        params = {"$filter": flt, "$select": "id", "$top": FEMA_PAGE_SIZE, "$skip": page * FEMA_PAGE_SIZE}
         data = http_get_json(FEMA_API_URL, params=params, timeout=12)
         records = data.get("DisasterDeclarationsSummaries", [])
-        count = len(records)
-        cache_set(ck, count, ttl_seconds=3600)
-        return count
-    except Exception:
-        return 0
+        total += len(records)
+        if len(records) < FEMA_PAGE_SIZE:
+            break
+    return total
 
 # -----------------------------
 # Data: ArcGIS feature counts
 # -----------------------------
-def get_arcgis_feature_count(base_url: str, where: str = "1=1") -> int:
-    if not base_url:
-        return 0
-
-    ck = f"arc_count:{base_url}|{where}"
-    cached = cache_get(ck)
-    if cached is not None:
-        return cached
-
+def load_arcgis_feature_count(base_url: str, where: str = "1=1") -> int:
     query_url = base_url.rstrip("/") + "/query"
     params = {"where": where, "returnCountOnly": "true", "f": "json"}
 
+    data = arcgis_json(query_url, params)
+    return int(data.get("count", 0))
+
+def arcgis_json(url: str, params: dict) -> dict:
+    """ArcGIS REST reports errors as HTTP 200 + {"error": ...}; turn those into exceptions."""
+    data = http_get_json(url, params=params, timeout=12)
+    if isinstance(data, dict) and data.get("error"):
+        raise RuntimeError(f"ArcGIS error from {url}: {data['error']}")
+    return data
+
+def split_layer_url(layer_url: str) -> tuple[str, int]:
+    """".../FeatureServer/6" -> (".../FeatureServer", 6)"""
+    service, _, layer_id = layer_url.rstrip("/").rpartition("/")
+    return service, int(layer_id)
+
+def arcgis_batches(queries: dict) -> dict:
+    """
+    Group count queries by FeatureServer.
+    Returns service_url -> {"service": url, "name": label,
+                            "layers": {layer_id: {"url": layer_url, "filters": {field: where}}}}
+    """
+    batches = {}
+    for field, (layer_url, where) in queries.items():
+        service, layer_id = split_layer_url(layer_url)
+        batch = batches.setdefault(service, {"service": service, "layers": {}})
+        layer = batch["layers"].setdefault(layer_id, {"url": layer_url, "filters": {}})
+        layer["filters"][field] = where
+
+    # Short label (service folder name) for job names / metrics; the full
+    # service path only when two services share a folder name
+    short = {service: service.rstrip("/").split("/")[-2] for service in batches}
+    for service, batch in batches.items():
+        clash = list(short.values()).count(short[service]) > 1
+        batch["name"] = "arcgis:" + (service.split("://", 1)[-1] if clash else short[service])
+    return batches
+
+def batch_fields(batch: dict) -> list[str]:
+    return [f for layer in batch["layers"].values() for f in layer["filters"]]
+
+def get_arcgis_batch_counts(batch: dict) -> dict:
+    filters = sorted((lid, f, w) for lid, layer in batch["layers"].items() for f, w in layer["filters"].items())
+    ck = f"arc_batch:{batch['service']}|{json.dumps(filters)}"
+    return cache_get_swr(
+        ck, lambda: load_arcgis_batch_counts(batch),
+        ttl_seconds=120,
+        fallback={f: 0 for f in batch_fields(batch)},
+    )
+
+def load_arcgis_batch_counts(batch: dict) -> dict:
+    """
+    One round trip per FeatureServer where the REST API allows it:
+    - several layers, one filter each: service-level query with layerDefs
+    - several filters on one layer: one outStatistics query
+    Falls back to plain per-layer returnCountOnly if the server refuses.
+    """
+    layers = batch["layers"]
+    if len(layers) > 1 and all(len(layer["filters"]) == 1 for layer in layers.values()):
+        try:
+            return load_arcgis_service_counts(batch)
+        except Exception:
+            pass  # service-level query not enabled on this server
+
+    out = {}
+    for layer in layers.values():
+        out.update(load_arcgis_layer_counts(layer["url"], layer["filters"]))
+    return out
+
+def load_arcgis_service_counts(batch: dict) -> dict:
+    layer_defs = {str(lid): next(iter(layer["filters"].values())) for lid, layer in batch["layers"].items()}
+    params = {"layerDefs": json.dumps(layer_defs), "returnCountOnly": "true", "f": "json"}
+    data = arcgis_json(batch["service"].rstrip("/") + "/query", params)
+
+    counts = {int(rec["id"]): int(rec.get("count", 0)) for rec in data.get("layers", [])}
+    out = {}
+    for lid, layer in batch["layers"].items():
+        if lid not in counts:
+            raise RuntimeError(f"layer {lid} missing from service query response")
+        field = next(iter(layer["filters"]))
+        out[field] = counts[lid]
+    return out
+
+def load_arcgis_layer_counts(layer_url: str, filters: dict) -> dict:
+    """field -> count for several where filters on one layer, in one request."""
+    if len(filters) == 1:
+        field, where = next(iter(filters.items()))
+        return {field: load_arcgis_feature_count(layer_url, where)}
+
+    fields = list(filters)
+    stats = [
+        {
+            "statisticType": "sum",
+            "onStatisticField": f"CASE WHEN ({filters[f]}) THEN 1 ELSE 0 END",
+            "outStatisticFieldName": f"n{i}",
+        }
+        for i, f in enumerate(fields)
+    ]
+    params = {"where": "1=1", "outStatistics": json.dumps(stats), "returnGeometry": "false", "f": "json"}
     try:
-        data = http_get_json(query_url, params=params, timeout=12)
-        count = int(data.get("count", 0))
-        cache_set(ck, count, ttl_seconds=120)
-        return count
+        data = arcgis_json(layer_url.rstrip("/") + "/query", params)
+        attrs = {k.lower(): v for k, v in data["features"][0]["attributes"].items()}
+        return {f: safe_int(attrs.get(f"n{i}"), 0) for i, f in enumerate(fields)}
     except Exception:
-        return 0
+        # SQL expressions in statistics are not enabled everywhere
+        return {f: load_arcgis_feature_count(layer_url, w) for f, w in filters.items()}
 
 # -----------------------------
 # Data: NWS current weather (observation)
@@ -329,17 +1412,8 @@ def parse_wind_speed(value):
     except Exception:
         return None
 
-def get_nws_current_conditions(lat: float, lon: float) -> dict:
-    """
-    Uses api.weather.gov/points -> observationStations -> stations/{id}/observations/latest
-    Returns: {temp_f, text, wind_mph, rh, obs_time}
-    """
-    ck = f"nws_obs:{lat:.3f},{lon:.3f}"
-    cached = cache_get(ck)
-    if cached:
-        return cached
-
-    out = {
+def empty_observation() -> dict:
+    return {
         "temp_f": None,
         "text": None,
         "wind_mph": None,
@@ -348,75 +1422,152 @@ def get_nws_current_conditions(lat: float, lon: float) -> dict:
         "station": None,
     }
 
+def get_nws_current_conditions(lat: float, lon: float) -> dict:
+    """
+    Uses api.weather.gov/points -> observationStations -> stations/{id}/observations/latest
+    The point -> station step is resolved once and kept on disk (see below), so a
+    refresh is a single observations/latest call per station.
+    Returns: {temp_f, text, wind_mph, rh, obs_time, station}
+    """
     try:
-        points = http_get_json(f"https://api.weather.gov/points/{lat},{lon}", timeout=12)
-        stations_url = points["properties"]["observationStations"]
-        stations = http_get_json(stations_url, timeout=12)
-        feats = stations.get("features", [])
-        if not feats:
-            cache_set(ck, out, ttl_seconds=300)
-            return out
+        station_id = resolve_nws_station(lat, lon)
+    except Exception:
+        return empty_observation()
+
+    ck = f"nws_obs:{station_id}"
+    return cache_get_swr(
+        ck,
+        lambda: load_nws_station_observation(station_id, ck),
+        ttl_seconds=300,  # 5 minutes
+        fallback={**empty_observation(), "station": station_id},
+    )
 
-        station_id = feats[0]["properties"].get("stationIdentifier") or feats[0]["id"].split("/")[-1]
-        out["station"] = station_id
+def load_nws_station_observation(station_id: str, ck: str) -> Fetched:
+    out = empty_observation()
+    out["station"] = station_id
 
-        obs = http_get_json(f"https://api.weather.gov/stations/{station_id}/observations/latest", timeout=12)
-        p = obs.get("properties", {})
+    try:
+        r = http_get_validated(f"https://api.weather.gov/stations/{station_id}/observations/latest", ck, timeout=12)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            forget_nws_station(station_id)  # station retired; re-resolve next time
+        raise
+    p = r.json().get("properties", {})
 
-        temp_c = p.get("temperature", {}).get("value")
-        if isinstance(temp_c, (int, float)):
-            out["temp_f"] = round(c_to_f(temp_c), 1)
+    temp_c = p.get("temperature", {}).get("value")
+    if isinstance(temp_c, (int, float)):
+        out["temp_f"] = round(c_to_f(temp_c), 1)
 
-        rh = p.get("relativeHumidity", {}).get("value")
-        if isinstance(rh, (int, float)):
-            out["rh"] = int(round(rh))
+    rh = p.get("relativeHumidity", {}).get("value")
+    if isinstance(rh, (int, float)):
+        out["rh"] = int(round(rh))
 
-        wind_ms = p.get("windSpeed", {}).get("value")
-        # sometimes windSpeed.value is in m/s, sometimes None; fallback to text speed
-        if isinstance(wind_ms, (int, float)):
-            out["wind_mph"] = round(meters_per_sec_to_mph(wind_ms), 1)
+    wind_ms = p.get("windSpeed", {}).get("value")
+    # sometimes windSpeed.value is in m/s, sometimes None; fallback to text speed
+    if isinstance(wind_ms, (int, float)):
+        out["wind_mph"] = round(meters_per_sec_to_mph(wind_ms), 1)
 
-        text = p.get("textDescription")
-        out["text"] = text
+    text = p.get("textDescription")
+    out["text"] = text
 
-        ts = p.get("timestamp")
-        out["obs_time"] = ts
+    ts = p.get("timestamp")
+    out["obs_time"] = ts
+    return Fetched(out, response_validators(r))
 
-        cache_set(ck, out, ttl_seconds=300)  # 5 minutes
-        return out
+# -----------------------------
+# Data: NWS point -> station resolution (persistent)
+# -----------------------------
+# "lat,lon" -> {"station": id, "resolved_at": epoch}. Points that share a
+# station share one observation cache entry, so adding towns is cheap.
+STATIONS = {"loaded": False, "table": {}}
+STATIONS_LOCK = threading.Lock()
+
+def point_key(lat: float, lon: float) -> str:
+    return f"{lat:.3f},{lon:.3f}"
+
+def station_table() -> dict:
+    with STATIONS_LOCK:
+        if not STATIONS["loaded"]:
+            try:
+                with open(NWS_STATIONS_PATH, "r", encoding="utf-8") as f:
+                    STATIONS["table"] = json.load(f)
+            except Exception:
+                STATIONS["table"] = {}
+            STATIONS["loaded"] = True
+        return STATIONS["table"]
+
+def save_station_table():
+    """Atomic write (tmp file + rename) so a crash never leaves half a file."""
+    with STATIONS_LOCK:
+        body = json.dumps(STATIONS["table"], indent=1, sort_keys=True)
+    try:
+        os.makedirs(os.path.dirname(NWS_STATIONS_PATH), exist_ok=True)
+        tmp = f"{NWS_STATIONS_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, NWS_STATIONS_PATH)
     except Exception:
-        cache_set(ck, out, ttl_seconds=300)
-        return out
+        pass  # read-only disk: keep the in-memory table
+
+def resolve_nws_station(lat: float, lon: float) -> str:
+    key = point_key(lat, lon)
+    rec = station_table().get(key)
+    if rec and time.time() < rec["resolved_at"] + NWS_STATION_TTL_SECONDS:
+        return rec["station"]
+
+    try:
+        station_id = cache_get_or_load(
+            f"nws_station:{key}", lambda: lookup_nws_station(lat, lon), ttl_seconds=NEGATIVE_TTL_SECONDS
+        )
+    except Exception:
+        if rec:
+            return rec["station"]  # an old mapping beats none
+        raise
+
+    with STATIONS_LOCK:
+        STATIONS["table"][key] = {"station": station_id, "resolved_at": time.time()}
+    save_station_table()
+    return station_id
+
+def lookup_nws_station(lat: float, lon: float) -> str:
+    points = http_get_json(f"https://api.weather.gov/points/{lat},{lon}", timeout=12)
+    stations_url = points["properties"]["observationStations"]
+    stations = http_get_json(stations_url, timeout=12)
+    feats = stations.get("features", [])
+    if not feats:
+        raise LookupError(f"no NWS observation stations near {lat},{lon}")
+    return feats[0]["properties"].get("stationIdentifier") or feats[0]["id"].split("/")[-1]
+
+def forget_nws_station(station_id: str):
+    with STATIONS_LOCK:
+        table = STATIONS["table"]
+        for key in [k for k, v in table.items() if v.get("station") == station_id]:
+            del table[key]
+    save_station_table()
 
 # -----------------------------
 # Data: NWS active alerts near a point
 # -----------------------------
 def get_nws_alerts_for_point(lat: float, lon: float) -> list[dict]:
     ck = f"nws_alerts:{lat:.3f},{lon:.3f}"
-    cached = cache_get(ck)
-    if cached is not None:
-        return cached
+    return cache_get_swr(ck, lambda: load_nws_alerts_for_point(lat, lon, ck), ttl_seconds=300, fallback=[])
 
+def load_nws_alerts_for_point(lat: float, lon: float, ck: str) -> Fetched:
     alerts_out = []
-    try:
-        data = http_get_json("https://api.weather.gov/alerts/active", params={"point": f"{lat},{lon}"}, timeout=12)
-        feats = data.get("features", [])
-        for f in feats[:15]:
-            p = f.get("properties", {})
-            alerts_out.append({
-                "id": f.get("id"),
-                "headline": p.get("headline") or p.get("event"),
-                "severity": p.get("severity"),
-                "urgency": p.get("urgency"),
-                "sent": p.get("sent"),
-                "ends": p.get("ends") or p.get("expires"),
-                "link": p.get("web"),
-            })
-        cache_set(ck, alerts_out, ttl_seconds=300)
-        return alerts_out
-    except Exception:
-        cache_set(ck, alerts_out, ttl_seconds=300)
-        return alerts_out
+    r = http_get_validated("https://api.weather.gov/alerts/active", ck, params={"point": f"{lat},{lon}"}, timeout=12)
+    feats = r.json().get("features", [])
+    for f in feats[:15]:
+        p = f.get("properties", {})
+        alerts_out.append({
+            "id": f.get("id"),
+            "headline": p.get("headline") or p.get("event"),
+            "severity": p.get("severity"),
+            "urgency": p.get("urgency"),
+            "sent": p.get("sent"),
+            "ends": p.get("ends") or p.get("expires"),
+            "link": p.get("web"),
+        })
+    return Fetched(alerts_out, response_validators(r))
 
 def merge_alerts(*lists):
     seen = set()
@@ -440,11 +1591,9 @@ def fetch_hccda_updates() -> list[dict]:
     ArcGIS Hub sites vary. We try a few common RSS-ish endpoints.
     If none work, returns [] and dashboard shows "No feed items".
     """
-    ck = "hccda_feed"
-    cached = cache_get(ck)
-    if cached is not None:
-        return cached
+    return cache_get_swr("hccda_feed", load_hccda_updates, ttl_seconds=600, fallback=[])
 
+def load_hccda_updates() -> Fetched:
     candidates = [
         f"{HCCDA_HUB}/rss",
         f"{HCCDA_HUB}/feed",
@@ -452,10 +1601,19 @@ def fetch_hccda_updates() -> list[dict]:
         f"{HCCDA_HUB}/pages/news?output=rss",
         f"{HCCDA_HUB}/pages/news?format=rss",
     ]
+    # try the endpoint that worked last time first, so steady state is one call
+    known = cache_get("hccda_feed_url")
+    if known in candidates:
+        candidates.remove(known)
+        candidates.insert(0, known)
 
     for url in candidates:
         try:
-            r = requests.get(url, headers=UA, timeout=12)
+            # validators in the cache came from the endpoint that last worked
+            held = held_record("hccda_feed") if url == known else None
+            r = http_get(url, timeout=12, headers=conditional_headers(held))
+            if r.status_code == 304 and held is not None:
+                raise NotModified(url, held)
             if r.status_code != 200:
                 continue
             txt = r.text.strip()
@@ -472,13 +1630,315 @@ def fetch_hccda_updates() -> list[dict]:
                 if title:
                     items.append({"title": title, "link": link, "published": pub})
             if items:
-                cache_set(ck, items, ttl_seconds=600)
-                return items
+                cache_set("hccda_feed_url", url, ttl_seconds=86400)
+                return Fetched(items, response_validators(r))
+        except NotModified:
+            raise
         except Exception:
             continue
 
-    cache_set(ck, [], ttl_seconds=600)
-    return []
+    raise RuntimeError("no HCCDA feed endpoint returned RSS items")
+
+# -----------------------------
+# ArcGIS feature sync + spatial index
+# -----------------------------
+# Full features (attributes + geometry) for the HCCDA layers, kept per process.
+# First sync pages the whole layer with resultOffset; later syncs pull only
+# features whose edit date moved (layer editFieldsInfo) plus the current
+# object id list to drop deletions. Layers without edit tracking reload fully.
+# Geometry is projected to a local km plane (equirectangular at 19.6N; well
+# under 1% error across the island) and bucketed in a uniform grid, so
+# proximity queries never touch the network. A background thread syncs every
+# FEATURE_SYNC_SECONDS, started lazily with the first live layer build (or
+# feature API call); until a layer's first sync lands, queries on it answer
+# 503 "syncing".
+FEATURE_SYNC_LAYERS = {
+    "road_closures": HAWAII_ROAD_CLOSURES_URL,
+    "fire_locations": HAWAII_FIRE_LOCATIONS_URL,
+    "evacuations": HAWAII_EVACUATIONS_URL,
+    "shelters": HAWAII_SHELTERS_URL,
+}
+FEATURE_SYNC_SECONDS = int(os.getenv("FEATURE_SYNC_SECONDS", "300"))
+FEATURE_PAGE_SIZE = int(os.getenv("FEATURE_PAGE_SIZE", "1000"))  # capped by the layer's maxRecordCount
+FEATURE_MAX_PAGES = int(os.getenv("FEATURE_MAX_PAGES", "100"))
+GRID_CELL_KM = float(os.getenv("GRID_CELL_KM", "2"))
+FEATURE_MAX_KM = 200.0  # query radius cap; the island is ~150 km across
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320 * math.cos(math.radians(19.6))
+
+FEATURES = {}  # layer -> store dict; replaced whole on each sync (readers never see a half update)
+FEATURE_SYNC = {name: {"lock": threading.Lock(), "last_error": None, "attempted_at": None} for name in FEATURE_SYNC_LAYERS}
+FEATURE_SYNC_ENABLED = os.getenv("FEATURE_SYNC", "1") == "1"
+FEATURE_SYNCER = {"thread": None, "pid": None}
+FEATURE_SYNCER_LOCK = threading.Lock()
+
+def to_km(lon: float, lat: float) -> tuple[float, float]:
+    return lon * KM_PER_DEG_LON, lat * KM_PER_DEG_LAT
+
+def from_km(x: float, y: float) -> tuple[float, float]:
+    return y / KM_PER_DEG_LAT, x / KM_PER_DEG_LON  # (lat, lon)
+
+def geometry_parts(geom: dict):
+    """ArcGIS JSON geometry (WGS84) -> (kind, [ndarray (n, 2) of km coords])."""
+    if not geom:
+        return None, []
+    if "x" in geom:
+        kind, parts = "point", [[[geom["x"], geom["y"]]]]
+    elif "points" in geom:
+        kind, parts = "point", [geom["points"]]
+    elif "paths" in geom:
+        kind, parts = "line", geom["paths"]
+    elif "rings" in geom:
+        kind, parts = "polygon", geom["rings"]
+    else:
+        return None, []
+    scale = np.array([KM_PER_DEG_LON, KM_PER_DEG_LAT])
+    return kind, [np.asarray(p, dtype=float)[:, :2] * scale for p in parts if len(p)]
+
+def make_feature(f: dict, oid_field: str):
+    kind, parts = geometry_parts(f.get("geometry"))
+    if not parts:
+        return None
+    allpts = np.vstack(parts)
+    return {
+        "oid": f["attributes"][oid_field],
+        "attributes": f["attributes"],
+        "kind": kind,
+        "parts": parts,
+        "bbox": (*allpts.min(axis=0), *allpts.max(axis=0)),
+        "anchor": tuple(allpts.mean(axis=0)),
+    }
+
+def grid_cells(bbox, pad: float = 0.0):
+    x0, y0, x1, y1 = bbox
+    for i in range(math.floor((x0 - pad) / GRID_CELL_KM), math.floor((x1 + pad) / GRID_CELL_KM) + 1):
+        for j in range(math.floor((y0 - pad) / GRID_CELL_KM), math.floor((y1 + pad) / GRID_CELL_KM) + 1):
+            yield i, j
+
+def build_grid(features: dict) -> dict:
+    grid = {}
+    for oid, feat in features.items():
+        for cell in grid_cells(feat["bbox"]):
+            grid.setdefault(cell, []).append(oid)
+    return grid
+
+def grid_candidates(store: dict, bbox, pad: float) -> set:
+    out = set()
+    grid = store["grid"]
+    x0, y0, x1, y1 = bbox
+    i0, i1 = math.floor((x0 - pad) / GRID_CELL_KM), math.floor((x1 + pad) / GRID_CELL_KM)
+    j0, j1 = math.floor((y0 - pad) / GRID_CELL_KM), math.floor((y1 + pad) / GRID_CELL_KM)
+    if (i1 - i0 + 1) * (j1 - j0 + 1) > len(grid):
+        # range covers more cells than are populated: walk the populated ones
+        for (i, j), oids in grid.items():
+            if i0 <= i <= i1 and j0 <= j <= j1:
+                out.update(oids)
+        return out
+    for cell in grid_cells(bbox, pad):
+        out.update(grid.get(cell, ()))
+    return out
+
+def point_in_rings(p, rings) -> bool:
+    """Even-odd rule across all rings, so holes work."""
+    inside = False
+    for r in rings:
+        a, b = r, np.roll(r, -1, axis=0)
+        crosses = ((a[:, 1] > p[1]) != (b[:, 1] > p[1])) & (
+            p[0] < (b[:, 0] - a[:, 0]) * (p[1] - a[:, 1]) / np.where(b[:, 1] == a[:, 1], 1e-12, b[:, 1] - a[:, 1]) + a[:, 0]
+        )
+        inside ^= bool(np.count_nonzero(crosses) % 2)
+    return inside
+
+def point_distance(p, feat: dict) -> float:
+    """km from point p (x, y) to a feature's geometry; 0 inside a polygon."""
+    if feat["kind"] == "polygon" and point_in_rings(p, feat["parts"]):
+        return 0.0
+    best = math.inf
+    for part in feat["parts"]:
+        if feat["kind"] == "point" or len(part) == 1:
+            d = np.hypot(*(part - p).T).min()
+        else:
+            a, ab = part[:-1], part[1:] - part[:-1]
+            t = np.clip(((p - a) * ab).sum(axis=1) / np.maximum((ab * ab).sum(axis=1), 1e-12), 0.0, 1.0)
+            d = np.hypot(*(a + t[:, None] * ab - p).T).min()
+        best = min(best, float(d))
+    return best
+
+def feature_distance(f: dict, g: dict) -> float:
+    """
+    km between two features. Exact when either is a point; for line/polygon
+    pairs it's the closest vertex-to-geometry distance both ways (edges that
+    cross without a vertex inside the other shape are not detected).
+    """
+    if g["kind"] == "point" and f["kind"] != "point":
+        f, g = g, f
+    best = math.inf
+    for part in f["parts"]:
+        for p in part:
+            best = min(best, point_distance(p, g))
+            if best == 0.0:
+                return 0.0
+    if f["kind"] != "point":
+        for part in g["parts"]:
+            for p in part:
+                best = min(best, point_distance(p, f))
+                if best == 0.0:
+                    return 0.0
+    return best
+
+def layer_meta(url: str) -> dict:
+    info = arcgis_json(url, {"f": "json"})
+    oid_field = info.get("objectIdField") or next(
+        (f["name"] for f in info.get("fields", []) if f.get("type") == "esriFieldTypeOID"), "OBJECTID"
+    )
+    return {
+        "oid_field": oid_field,
+        "edit_field": (info.get("editFieldsInfo") or {}).get("editDateField"),
+        "page_size": min(FEATURE_PAGE_SIZE, int(info.get("maxRecordCount") or FEATURE_PAGE_SIZE)),
+        "paging": bool((info.get("advancedQueryCapabilities") or {}).get("supportsPagination", True)),
+    }
+
+def page_features(url: str, meta: dict, where: str) -> list[dict]:
+    """All features matching where, paged with resultOffset/resultRecordCount."""
+    out, offset = [], 0
+    for _ in range(FEATURE_MAX_PAGES):
+        params = {
+            "where": where,
+            "outFields": "*",
+            "returnGeometry": "true",
+            "outSR": 4326,
+            "orderByFields": meta["oid_field"],
+            "f": "json",
+        }
+        if meta["paging"]:
+            params.update(resultOffset=offset, resultRecordCount=meta["page_size"])
+        data = arcgis_json(f"{url}/query", params)
+        batch = data.get("features") or []
+        out.extend(batch)
+        if not meta["paging"] or not batch or not data.get("exceededTransferLimit"):
+            return out
+        offset += len(batch)
+    raise RuntimeError(f"{url}: more than {FEATURE_MAX_PAGES} pages")
+
+def edit_where(field: str, since_ms: float) -> str:
+    ts = datetime.fromtimestamp(since_ms / 1000.0, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{field} >= timestamp '{ts}'"
+
+def sync_layer(name: str) -> dict:
+    """Brings FEATURES[name] up to date; returns the new store."""
+    url = FEATURE_SYNC_LAYERS[name]
+    state = FEATURE_SYNC[name]
+    with state["lock"]:
+        state["attempted_at"] = time.time()
+        old = FEATURES.get(name)
+        try:
+            meta = old["meta"] if old else layer_meta(url)
+            incremental = bool(old and meta["edit_field"] and old["last_edit"])
+            if incremental:
+                changed = page_features(url, meta, edit_where(meta["edit_field"], old["last_edit"]))
+                ids = arcgis_json(f"{url}/query", {"where": "1=1", "returnIdsOnly": "true", "f": "json"})
+                live_ids = set(ids.get("objectIds") or [])
+                features = {oid: f for oid, f in old["features"].items() if oid in live_ids}
+            else:
+                changed = page_features(url, meta, "1=1")
+                features = {}
+
+            for raw in changed:
+                feat = make_feature(raw, meta["oid_field"])
+                if feat is not None:
+                    features[feat["oid"]] = feat
+
+            edits = [f["attributes"].get(meta["edit_field"]) for f in features.values()] if meta["edit_field"] else []
+            store = {
+                "meta": meta,
+                "features": features,
+                "grid": build_grid(features),
+                "last_edit": max((e for e in edits if isinstance(e, (int, float))), default=None),
+                "synced_at": time.time(),
+                "last_sync": {"mode": "incremental" if incremental else "full", "fetched": len(changed)},
+            }
+            FEATURES[name] = store
+            state["last_error"] = None
+            return store
+        except Exception as e:
+            state["last_error"] = repr(e)
+            raise
+
+class FeaturesSyncing(Exception):
+    """A layer's first sync hasn't finished in this process yet."""
+
+def feature_sync_loop():
+    while True:
+        for name in FEATURE_SYNC_LAYERS:
+            try:
+                sync_layer(name)
+            except Exception:
+                pass  # keep serving the last synced features; error is in FEATURE_SYNC
+        time.sleep(FEATURE_SYNC_SECONDS)
+
+def ensure_feature_sync():
+    """Starts the syncer (first pass immediately); again in a worker forked after it started."""
+    if not FEATURE_SYNC_ENABLED or FEATURE_SYNCER["pid"] == os.getpid():
+        return
+    with FEATURE_SYNCER_LOCK:
+        if FEATURE_SYNCER["pid"] != os.getpid():
+            t = threading.Thread(target=feature_sync_loop, name="hiema-feature-sync", daemon=True)
+            t.start()
+            FEATURE_SYNCER.update(thread=t, pid=os.getpid())
+
+def feature_store(name: str) -> dict:
+    """Synced store for a layer. Never calls upstream; FeaturesSyncing until the first sync lands."""
+    ensure_feature_sync()
+    store = FEATURES.get(name)
+    if store is None:
+        raise FeaturesSyncing(name)
+    return store
+
+def attribute_match(feat: dict, filters: list) -> bool:
+    attrs = {k.lower(): v for k, v in feat["attributes"].items()}
+    return all(str(attrs.get(k.lower(), "")).strip().lower() == v.strip().lower() for k, v in filters)
+
+def features_near_point(name: str, lat: float, lon: float, km: float, filters=()) -> list[dict]:
+    store = feature_store(name)
+    p = np.array(to_km(lon, lat))
+    hits = []
+    for oid in grid_candidates(store, (p[0], p[1], p[0], p[1]), km):
+        feat = store["features"][oid]
+        if filters and not attribute_match(feat, filters):
+            continue
+        d = point_distance(p, feat)
+        if d <= km:
+            hits.append((d, feat, None))
+    return sorted(hits, key=lambda h: h[0])
+
+def features_near_layer(name: str, other: str, km: float, filters=()) -> list[dict]:
+    """Features of `name` within km of any feature of `other`, with the closest one."""
+    store, targets = feature_store(name), feature_store(other)
+    best = {}
+    for target in targets["features"].values():
+        for oid in grid_candidates(store, target["bbox"], km):
+            feat = store["features"][oid]
+            if filters and not attribute_match(feat, filters):
+                continue
+            d = feature_distance(feat, target)
+            if d <= km and (oid not in best or d < best[oid][0]):
+                best[oid] = (d, feat, target["oid"])
+    return sorted(best.values(), key=lambda h: h[0])
+
+def feature_status() -> dict:
+    out = {}
+    for name, url in FEATURE_SYNC_LAYERS.items():
+        store, state = FEATURES.get(name), FEATURE_SYNC[name]
+        out[name] = {
+            "url": url,
+            "features": len(store["features"]) if store else 0,
+            "synced_at": store["synced_at"] if store else None,
+            "last_sync": store["last_sync"] if store else None,
+            "edit_tracking": bool(store and store["meta"]["edit_field"]),
+            "last_error": state["last_error"],
+        }
+    return out
 
 # -----------------------------
 # Event modeling (training)
@@ -565,22 +2025,28 @@ def compute_assumptions(pop: int, event: str, severity: int) -> dict:
         "coa": prof["coa"],
     }
 
+def hazard_strain_points(live: dict) -> int:
+    """The part of compute_strain that depends only on live data (also used by the scenario matrix)."""
+    s = 0
+
+    # hazard signals
+    s += 8 if live["fire_events"] > 0 else 0
+    s += 8 if live["road_closures_live"] > 0 else 0
+    s += 6 if (live["water_shutoffs"] > 0 or live["water_restrictions"] > 0) else 0
+    s += 6 if live["volcano_sites"] > 0 else 0
+    s += 10 if live["evacuation_features"] > 0 else 0
+
+    # NWS alerts are big EM signals
+    s += min(18, 4 * len(live.get("nws_alerts", [])))
+    return s
+
 def compute_strain(snapshot: dict, severity: int) -> tuple[int, str]:
     """
     Simple demo index: combines hazard counts + NWS alerts + severity.
     """
     s = 0
     s += severity * 8
-
-    # hazard signals
-    s += 8 if snapshot["fire_events"] > 0 else 0
-    s += 8 if snapshot["road_closures_live"] > 0 else 0
-    s += 6 if (snapshot["water_shutoffs"] > 0 or snapshot["water_restrictions"] > 0) else 0
-    s += 6 if snapshot["volcano_sites"] > 0 else 0
-    s += 10 if snapshot["evacuation_features"] > 0 else 0
-
-    # NWS alerts are big EM signals
-    s += min(18, 4 * len(snapshot.get("nws_alerts", [])))
+    s += hazard_strain_points(snapshot)
 
     # shelter demand matters
     if snapshot["estimated_shelter_need"] >= 5000:
@@ -630,17 +2096,315 @@ def recommend_eoc_and_staffing(strain_score: int, severity: int, staffing_factor
         "total": scaled, "ops": ops, "plans": plans, "log": log, "finance": finance, "pio": pio, "lno": lno
     }
 
+# -----------------------------
+# Scenario matrix (vectorized)
+# -----------------------------
+# The same math as compute_assumptions -> compute_strain ->
+# recommend_eoc_and_staffing, evaluated for every event x severity x
+# population at once with NumPy. Axes are (event, severity, population).
+# np.rint rounds half to even like round(), so results match the scalar path.
+SCENARIO_MAX_POPULATIONS = int(os.getenv("SCENARIO_MAX_POPULATIONS", "200"))
+SCENARIO_MAX_POPULATION = 1_000_000_000  # per population; keeps the int64 math exact
+SCENARIO_MAX_POP_SCALE = 1000.0
+STAFF_SECTIONS = (("ops", 0.38), ("plans", 0.22), ("log", 0.18), ("finance", 0.12), ("pio", 0.07))
+
+def profile_arrays(events: list) -> dict:
+    profs = [EVENT_PROFILES[e] for e in events]
+    return {
+        "affected_base": np.array([p["affected_base"] for p in profs], dtype=float),
+        "shelter_of_affected": np.array([p["shelter_of_affected"] for p in profs], dtype=float),
+        "staffing_factor": np.array([p["staffing_factor"] for p in profs], dtype=float),
+    }
+
+def strain_and_staffing(hazard_points: int, sev, shelter_need, staffing_factor):
+    """compute_strain + recommend_eoc_and_staffing on broadcastable arrays."""
+    strain = sev * 8 + hazard_points + np.select(
+        [shelter_need >= 5000, shelter_need >= 1000, shelter_need > 0], [10, 6, 3], default=0,
+    )
+    strain = np.clip(strain, 0, 100)
+
+    # activation tier as its base staffing: 0 none, 12 partial, 24 full
+    none = (strain <= 25) & (sev <= 2)
+    base_total = np.where(none, 0, np.where(strain <= 55, 12, 24))
+    scaled = np.clip(np.rint(base_total * staffing_factor), base_total, 40)
+    scaled = np.where(base_total == 0, 0, scaled)
+
+    staffing = {"total": scaled}
+    for name, share in STAFF_SECTIONS:
+        staffing[name] = np.rint(scaled * share)
+    staffing["lno"] = np.maximum(0, scaled - sum(staffing[name] for name, _ in STAFF_SECTIONS))
+    return strain, base_total, staffing
+
+ACTIVATION_LABELS = {0: "No EOC activation necessary", 12: "Partial Activation", 24: "Full Activation"}
+
+def strain_labels(strain, base_total):
+    """String arrays (strain level, EOC activation); only built when a response needs them."""
+    level = np.select([strain <= 30, strain <= 60], ["Low", "Moderate"], default="High")
+    activation = np.select([base_total == 0, base_total == 12], [ACTIVATION_LABELS[0], ACTIVATION_LABELS[12]], default=ACTIVATION_LABELS[24])
+    return level, activation
+
+def scenario_matrix(live: dict, events: list, severities: list, populations: list) -> dict:
+    prof = profile_arrays(events)
+    sev = np.array(severities, dtype=float)[None, :]         # (1, S)
+    pop = np.array(populations, dtype=float)[None, None, :]  # (1, 1, P)
+
+    sev_mult = 0.7 + (sev * 0.15)
+    affected_pct = np.clip(prof["affected_base"][:, None] * sev_mult, 0.01, 0.85)        # (E, S)
+    shelter_pct = np.clip(prof["shelter_of_affected"][:, None] * sev_mult, 0.01, 0.60)   # (E, S)
+    staffing_factor = prof["staffing_factor"][:, None] * sev_mult                        # (E, S)
+
+    affected = np.rint(pop * affected_pct[:, :, None])                 # (E, S, P)
+    shelter_need = np.rint(affected * shelter_pct[:, :, None])
+
+    strain, base_total, staffing = strain_and_staffing(
+        hazard_strain_points(live), sev[:, :, None], shelter_need, staffing_factor[:, :, None],
+    )
+    level, activation = strain_labels(strain, base_total)
+
+    def as_int(a):
+        return a.astype(int).tolist()
+
+    return {
+        "axes": {"event": events, "severity": severities, "population": populations},
+        "event_labels": [EVENT_PROFILES[e]["label"] for e in events],
+        "affected_pct": affected_pct.tolist(),
+        "shelter_pct": shelter_pct.tolist(),
+        "population_affected": as_int(affected),
+        "estimated_shelter_need": as_int(shelter_need),
+        "strain_score": as_int(strain),
+        "strain_level": level.tolist(),
+        "eoc_recommendation": activation.tolist(),
+        "staffing": {name: as_int(a) for name, a in staffing.items()},
+    }
+
+def scenario_rows(matrix: dict) -> list[dict]:
+    """Flattens a scenario_matrix() result to one dict per combination."""
+    ax = matrix["axes"]
+    rows = []
+    for i, event in enumerate(ax["event"]):
+        for j, severity in enumerate(ax["severity"]):
+            for k, pop in enumerate(ax["population"]):
+                rows.append({
+                    "event": event,
+                    "severity": severity,
+                    "population": pop,
+                    "affected_pct": matrix["affected_pct"][i][j],
+                    "shelter_pct": matrix["shelter_pct"][i][j],
+                    "population_affected": matrix["population_affected"][i][j][k],
+                    "estimated_shelter_need": matrix["estimated_shelter_need"][i][j][k],
+                    "strain_score": matrix["strain_score"][i][j][k],
+                    "strain_level": matrix["strain_level"][i][j][k],
+                    "eoc_recommendation": matrix["eoc_recommendation"][i][j][k],
+                    "staffing": {name: a[i][j][k] for name, a in matrix["staffing"].items()},
+                })
+    return rows
+
+# -----------------------------
+# Monte Carlo uncertainty (vectorized)
+# -----------------------------
+# Instead of one point estimate, sample the model's rates and push every draw
+# through the same vectorized math as the scenario matrix. Each rate is the
+# profile value times a random factor whose distribution is set below (or via
+# MC_DISTRIBUTIONS as JSON). Results are cached per live_version, so a given
+# live dataset + scenario is simulated once.
+MC_DRAWS = int(os.getenv("MC_DRAWS", "100000"))
+MC_TTL_SECONDS = int(os.getenv("MC_TTL_SECONDS", "3600"))
+MC_DISTRIBUTIONS = {
+    # factor applied to EVENT_PROFILES[...]["affected_base"]
+    "affected_base": {"dist": "triangular", "low": 0.6, "mode": 1.0, "high": 1.6},
+    # factor applied to EVENT_PROFILES[...]["shelter_of_affected"]
+    "shelter_of_affected": {"dist": "lognormal", "sigma": 0.35},
+    # factor applied to the severity multiplier (0.7 + 0.15 * severity)
+    "sev_mult": {"dist": "normal", "sd": 0.08},
+    # factor applied to EVENT_PROFILES[...]["staffing_factor"]
+    "staffing_factor": {"dist": "uniform", "low": 0.9, "high": 1.1},
+}
+MC_DISTRIBUTIONS.update(json.loads(os.getenv("MC_DISTRIBUTIONS", "{}")))
+MC_PERCENTILES = (10, 50, 90)
+
+def mc_factor(rng, spec: dict, n: int):
+    """n random multipliers centred on 1.0 (lognormal has median 1)."""
+    dist = spec["dist"]
+    if dist == "triangular":
+        return rng.triangular(spec["low"], spec.get("mode", 1.0), spec["high"], n)
+    if dist == "lognormal":
+        return rng.lognormal(0.0, spec["sigma"], n)
+    if dist == "normal":
+        return np.maximum(rng.normal(1.0, spec["sd"], n), 0.0)
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], n)
+    if dist == "fixed":
+        return np.ones(n)
+    raise ValueError(f"unknown distribution: {dist}")
+
+def mc_seed(*parts) -> int:
+    """Deterministic seed, so the same live data + scenario gives the same answer."""
+    return int.from_bytes(hashlib.sha1(repr(parts).encode("utf-8")).digest()[:8], "big")
+
+def simulate_uncertainty(live: dict, event: str, severity: int, draws: int = MC_DRAWS) -> dict:
+    prof = EVENT_PROFILES[event]
+    rng = np.random.default_rng(mc_seed(live["live_version"], event, severity, draws))
+
+    sev_mult = (0.7 + severity * 0.15) * mc_factor(rng, MC_DISTRIBUTIONS["sev_mult"], draws)
+    affected_pct = np.clip(prof["affected_base"] * mc_factor(rng, MC_DISTRIBUTIONS["affected_base"], draws) * sev_mult, 0.01, 0.85)
+    shelter_pct = np.clip(prof["shelter_of_affected"] * mc_factor(rng, MC_DISTRIBUTIONS["shelter_of_affected"], draws) * sev_mult, 0.01, 0.60)
+    staffing_factor = prof["staffing_factor"] * mc_factor(rng, MC_DISTRIBUTIONS["staffing_factor"], draws) * sev_mult
+
+    affected = np.rint(live["juris_population"] * affected_pct)
+    shelter_need = np.rint(affected * shelter_pct)
+    strain, base_total, staffing = strain_and_staffing(
+        hazard_strain_points(live), severity, shelter_need, staffing_factor,
+    )
+
+    def pct(a):
+        return dict(zip((f"p{p}" for p in MC_PERCENTILES), (int(v) for v in np.rint(np.percentile(a, MC_PERCENTILES)))))
+
+    tiers, counts = np.unique(base_total, return_counts=True)
+    return {
+        "event": event,
+        "severity": severity,
+        "draws": draws,
+        "live_version": live["live_version"],
+        "population_affected": pct(affected),
+        "estimated_shelter_need": pct(shelter_need),
+        "strain_score": pct(strain),
+        "staffing_total": pct(staffing["total"]),
+        "activation_probability": {ACTIVATION_LABELS[int(t)]: round(int(c) / draws, 4) for t, c in zip(tiers, counts)},
+        "distributions": MC_DISTRIBUTIONS,
+    }
+
+def get_uncertainty(event: str, severity: int) -> dict:
+    live = get_live_layer()
+    return cache_get_or_load(
+        f"mc:{live['live_version']}:{event}:{severity}:{MC_DRAWS}",
+        lambda: simulate_uncertainty(live, event, severity),
+        ttl_seconds=MC_TTL_SECONDS,
+    )
+
+# -----------------------------
+# Concurrent fetch stage
+# -----------------------------
+FETCH_POOL = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="hiema-fetch")
+ARCGIS_BATCHES = arcgis_batches(ARCGIS_COUNT_QUERIES)
+
+def live_fetch_jobs() -> dict:
+    """
+    Every independent upstream read a snapshot needs.
+    name -> (fn, args, fallback used if it fails or misses the deadline)
+    """
+    jobs = {
+        "population": (get_jurisdiction_population, (), (FALLBACK_POP_2024, FALLBACK_POP_SOURCE)),
+        "fema_disasters": (get_fema_disaster_count_for_state, (STATE_ABBR,), 0),
+        "feed_items": (fetch_hccda_updates, (), []),
+    }
+    for batch in ARCGIS_BATCHES.values():
+        jobs[batch["name"]] = (get_arcgis_batch_counts, (batch,), {f: 0 for f in batch_fields(batch)})
+    for name, (lat, lon) in POINTS.items():
+        jobs[f"weather:{name}"] = (get_nws_current_conditions, (lat, lon), empty_observation())
+        jobs[f"alerts:{name}"] = (get_nws_alerts_for_point, (lat, lon), [])
+    return jobs
+
+def run_traced(name, fn, args, deadline=None, owner=None):
+    """Runs one fetch job and returns (value, cache reads it made, seconds)."""
+    SOURCE_TRACE.reads = []
+    SOURCE_TRACE.deadline = deadline
+    if owner is not None:
+        PROFILE_OWNERS[threading.get_ident()] = owner  # sampled as part of that request
+    start = time.perf_counter()
+    try:
+        return fn(*args), SOURCE_TRACE.reads, time.perf_counter() - start
+    finally:
+        SOURCE_TRACE.reads = None
+        SOURCE_TRACE.deadline = None
+        PROFILE_OWNERS.pop(threading.get_ident(), None)
+        observe("hiema_source_fetch_seconds", time.perf_counter() - start, source=name)
+
+def peek_cached(fn, args):
+    """
+    Re-runs a job that missed the deadline against the cache only: it returns
+    whatever the cache holds (stale is fine) and raises DeadlineExceeded
+    instead of making any upstream call. Pure CPU on the calling thread.
+    """
+    SOURCE_TRACE.reads = []
+    SOURCE_TRACE.cache_only = True
+    try:
+        return fn(*args), SOURCE_TRACE.reads
+    finally:
+        SOURCE_TRACE.reads = None
+        SOURCE_TRACE.cache_only = False
+
+def source_freshness(reads: list, now: float) -> dict:
+    """Oldest cache entry a source was built from -> staleness info for the snapshot."""
+    if not reads:
+        return {"fetched_at": None, "age_seconds": None, "stale": True, "ok": False, "degraded": True}
+    stored = min(r["stored"] for r in reads)
+    ok = all(r["ok"] for r in reads)
+    return {
+        "fetched_at": datetime.fromtimestamp(stored, timezone.utc).isoformat(timespec="seconds"),
+        "age_seconds": int(now - stored),
+        "stale": any(now >= r["expires"] for r in reads),
+        "ok": ok,
+        "degraded": not ok,
+    }
+
+def run_fetch_stage(jobs: dict, deadline_seconds: float = SNAPSHOT_DEADLINE_SECONDS) -> tuple[dict, dict]:
+    """
+    Runs all jobs on FETCH_POOL and waits at most deadline_seconds in total.
+    Jobs still running at the deadline keep going in the background (they warm
+    the cache for the next request) but this snapshot uses their fallback.
+    Returns (results, sources) where sources[name] carries staleness info.
+    HTTP calls made by the jobs share the same deadline (see call_budget). A
+    job that missed it serves its last cached value (peek_cached, reason
+    "deadline"); only a cold miss uses the static fallback and is degraded.
+    """
+    deadline = time.time() + deadline_seconds
+    owner = threading.get_ident() if PROFILE_SLOWEST > 0 else None
+    futures = {
+        FETCH_POOL.submit(run_traced, name, fn, args, deadline, owner): name
+        for name, (fn, args, _) in jobs.items()
+    }
+    done, _ = wait(futures, timeout=deadline_seconds)
+
+    now = time.time()
+    results, sources = {}, {}
+    for fut, name in futures.items():
+        if fut in done and fut.exception() is None:
+            results[name], reads, seconds = fut.result()
+            add_span(f"src:{name}", seconds)
+            sources[name] = source_freshness(reads, now)
+            if sources[name]["degraded"]:
+                sources[name]["reason"] = "fallback"
+        elif fut not in done:
+            fn, args, fallback = jobs[name]
+            try:
+                results[name], reads = peek_cached(fn, args)
+            except Exception:
+                results[name], reads = fallback, []
+            sources[name] = source_freshness(reads, now)
+            sources[name]["reason"] = "deadline"
+        else:
+            results[name] = jobs[name][2]
+            sources[name] = source_freshness([], now)
+            sources[name]["reason"] = repr(fut.exception())
+    return results, sources
+
 # -----------------------------
 # Snapshot builder
 # -----------------------------
-def build_live_snapshot(event: str = "baseline", severity: int = 3) -> dict:
+def build_live_layer() -> dict:
+    """
+    Layer 1: everything that comes from upstreams and is the same for every
+    event/severity. Built once per LIVE_LAYER_TTL_SECONDS and shared.
+    """
+    started = time.perf_counter()
     now_utc_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
 
-    pop, pop_source = get_jurisdiction_population()
-    assumptions = compute_assumptions(pop, event, severity)
+    with span("fetch"):
+        live, sources = run_fetch_stage(live_fetch_jobs())
+    observe("hiema_snapshot_stage_seconds", time.perf_counter() - started, stage="fetch")
+    pop, pop_source = live["population"]
 
-    # ArcGIS / FEMA counts
-    snap = {
+    layer = {
         "agency": AGENCY_NAME,
         "snapshot_name": SNAPSHOT_NAME,
         "juris_label": JURIS_LABEL,
@@ -648,45 +2412,68 @@ def build_live_snapshot(event: str = "baseline", severity: int = 3) -> dict:
         "state_abbr": STATE_ABBR,
         "generated_at": now_utc_iso,
 
-        "event": (event or "baseline").lower(),
-        "severity": clamp(safe_int(severity, 3), 1, 5),
-        "event_label": assumptions["event_label"],
-
         "juris_population": pop,
         "population_source": pop_source,
 
-        "population_affected": assumptions["affected"],
-        "estimated_shelter_need": assumptions["shelter_need"],
-        "affected_pct": assumptions["affected_pct"],
-        "shelter_pct": assumptions["shelter_pct"],
-
-        "volcano_sites": get_arcgis_feature_count(HAWAII_VOLCANO_STATUS_URL),
-        "water_shutoffs": get_arcgis_feature_count(HAWAII_WATER_SHUTOFF_URL),
-        "water_restrictions": get_arcgis_feature_count(HAWAII_WATER_RESTRICTION_URL),
-        "fire_events": get_arcgis_feature_count(HAWAII_FIRE_LOCATIONS_URL),
-        "shelters_layer_count": get_arcgis_feature_count(HAWAII_SHELTERS_URL),
-        "road_closures_live": get_arcgis_feature_count(HAWAII_ROAD_CLOSURES_URL),
-        "evacuation_features": get_arcgis_feature_count(HAWAII_EVACUATIONS_URL),
-        "noaa_metar_sites": get_arcgis_feature_count(NOAA_METAR_WIND_URL),
-        "nws_watch_warning_count": get_arcgis_feature_count(NWS_WATCHES_WARNINGS_URL),
-
-        "fema_disasters": get_fema_disaster_count_for_state(STATE_ABBR),
+        # ArcGIS / FEMA counts
+        "fema_disasters": live["fema_disasters"],
     }
+    for batch in ARCGIS_BATCHES.values():
+        layer.update(live[batch["name"]])
+        for field in batch_fields(batch):
+            sources[field] = sources[batch["name"]]
+        del sources[batch["name"]]
 
     # Weather
-    weather = []
-    for name, (lat, lon) in POINTS.items():
-        obs = get_nws_current_conditions(lat, lon)
-        weather.append({"name": name, **obs})
-    snap["weather"] = weather
+    layer["weather"] = [{"name": name, **live[f"weather:{name}"]} for name in POINTS]
 
     # Alerts
-    hilo_alerts = get_nws_alerts_for_point(*POINTS["Hilo"])
-    kona_alerts = get_nws_alerts_for_point(*POINTS["Kailua-Kona"])
-    snap["nws_alerts"] = merge_alerts(hilo_alerts, kona_alerts)[:6]
+    layer["nws_alerts"] = merge_alerts(*(live[f"alerts:{name}"] for name in POINTS))[:6]
 
     # Civil defense updates
-    snap["feed_items"] = fetch_hccda_updates()
+    layer["feed_items"] = live["feed_items"]
+
+    # Content id of the live data (ignores timestamps), for downstream caches
+    layer["live_version"] = live_layer_version(layer)
+
+    # When each value was fetched (the background refresher keeps these young)
+    layer["sources"] = sources
+    layer["degraded_sources"] = sorted(name for name, src in sources.items() if src["degraded"])
+
+    if HISTORY_ENABLED:
+        HISTORY_LATEST["layer"] = layer  # recorded by the history thread, off the request path
+        ensure_history_recorder()
+    ensure_feature_sync()  # first use of the app: feature layers are local before anyone queries them
+    observe("hiema_snapshot_stage_seconds", time.perf_counter() - started, stage="live_layer")
+    return layer
+
+def live_layer_version(layer: dict) -> str:
+    body = {k: v for k, v in layer.items() if k not in ("generated_at", "sources", "degraded_sources", "live_version")}
+    return hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def get_live_layer() -> dict:
+    with span("live_layer"):
+        return cache_get_or_load("live_layer", build_live_layer, ttl_seconds=LIVE_LAYER_TTL_SECONDS)
+
+def build_scenario_snapshot(live: dict, event: str = "baseline", severity: int = 3) -> dict:
+    """
+    Layer 2: event/severity derivations on top of a shared live layer.
+    Pure CPU (no I/O), so switching scenarios in the UI costs microseconds.
+    """
+    started = time.perf_counter()
+    assumptions = compute_assumptions(live["juris_population"], event, severity)
+
+    snap = dict(live)
+    snap.update({
+        "event": (event or "baseline").lower(),
+        "severity": clamp(safe_int(severity, 3), 1, 5),
+        "event_label": assumptions["event_label"],
+
+        "population_affected": assumptions["affected"],
+        "estimated_shelter_need": assumptions["shelter_need"],
+        "affected_pct": assumptions["affected_pct"],
+        "shelter_pct": assumptions["shelter_pct"],
+    })
 
     # Strain + staffing + COAs
     strain_score, strain_level = compute_strain(snap, snap["severity"])
@@ -708,8 +2495,14 @@ def build_live_snapshot(event: str = "baseline", severity: int = 3) -> dict:
     # Recommended actions (short, actionable)
     snap["recommended_actions"] = build_recommended_actions(snap)
 
+    observe("hiema_snapshot_stage_seconds", time.perf_counter() - started, stage="scenario")
     return snap
 
+def build_live_snapshot(event: str = "baseline", severity: int = 3) -> dict:
+    live = get_live_layer()
+    with span("scenario"):
+        return build_scenario_snapshot(live, event, severity)
+
 def build_sit_summary(s: dict) -> str:
     # Quick EM summary that always populates
     bits = []
@@ -745,45 +2538,394 @@ def build_recommended_actions(s: dict) -> list[str]:
         actions.append("Maintain monitoring posture; prepare escalation triggers if conditions worsen.")
     return actions[:6]
 
+# -----------------------------
+# History store (append-only time series of numeric snapshot fields)
+# -----------------------------
+# One directory per field under HISTORY_DIR, one file per resolution:
+#   raw.bin  fixed 12-byte records (t float64, value float32), one per upstream
+#            fetch of the field's source, stamped with the fetch time
+#   5m.bin / 1h.bin  fixed 24-byte rollups (bucket start, mean, min, max, n)
+# Records are time-ordered, so a range query memory-maps the file and binary
+# searches it; only the requested slice is read. Each file is trimmed to its
+# retention window at most once an hour (tail copied to a new file).
+# A background thread does all file work: every HISTORY_INTERVAL_SECONDS it
+# appends fields whose source was re-fetched since the last sample and rolls
+# up every bucket that has closed since each tier's last record.
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_DIR = os.getenv("HISTORY_DIR", os.path.join(app.root_path, "data", "history"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))
+HISTORY_INTERVAL_SECONDS = int(os.getenv("HISTORY_INTERVAL_SECONDS", str(LIVE_LAYER_TTL_SECONDS)))
+HISTORY_SETTLE_SECONDS = 120  # a sample is stamped with its fetch time and can be recorded this late
+
+RAW_DTYPE = np.dtype([("t", "<f8"), ("v", "<f4")])
+ROLLUP_DTYPE = np.dtype([("t", "<f8"), ("mean", "<f4"), ("min", "<f4"), ("max", "<f4"), ("n", "<u4")])
+
+# resolution -> (bucket seconds, retention seconds); 0 buckets = raw samples
+HISTORY_TIERS = {
+    "raw": (0, int(os.getenv("HISTORY_RAW_RETENTION_SECONDS", str(2 * 86400)))),
+    "5m": (300, int(os.getenv("HISTORY_5M_RETENTION_SECONDS", str(30 * 86400)))),
+    "1h": (3600, int(os.getenv("HISTORY_1H_RETENTION_SECONDS", str(730 * 86400)))),
+}
+
+HISTORY_LOCK = threading.Lock()
+HISTORY_TRIMMED = {}  # file path -> last trim time
+HISTORY_LATEST = {"layer": None}  # newest live layer, set by build_live_layer
+HISTORY_STORED = {}   # field -> fetch time of the last sample appended by this process
+HISTORY_ROLLED = {}   # (field, tier) -> bucket boundary rolled up to
+HISTORY_RECORDER = {"thread": None}
+HISTORY_RECORDER_LOCK = threading.Lock()
+
+def history_samples(layer: dict) -> dict:
+    """field -> (fetch time, number), skipping sources that fell back (a 0 there isn't data)."""
+    sources = layer.get("sources", {})
+
+    def fetched(*names):
+        stamps = []
+        for name in names:
+            src = sources.get(name) or {}
+            if src.get("degraded", True) or not src.get("fetched_at"):
+                return None
+            stamps.append(datetime.fromisoformat(src["fetched_at"]).timestamp())
+        return max(stamps)
+
+    out = {}
+
+    def add(field, value, *names):
+        t = fetched(*names)
+        if t is not None:
+            out[field] = (t, value)
+
+    add("juris_population", layer["juris_population"], "population")
+    add("fema_disasters", layer["fema_disasters"], "fema_disasters")
+    for field in ARCGIS_COUNT_QUERIES:
+        add(field, layer[field], field)
+    add("nws_alerts", len(layer["nws_alerts"]), *(f"alerts:{name}" for name in POINTS))
+    for w in layer["weather"]:
+        for k in ("temp_f", "wind_mph", "rh"):
+            if isinstance(w.get(k), (int, float)):
+                add(f"{k}_{w['name']}", w[k], f"weather:{w['name']}")
+    return out
+
+def history_path(field: str, tier: str) -> str:
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in field)
+    return os.path.join(HISTORY_DIR, safe, f"{tier}.bin")
+
+@contextmanager
+def history_locked(path: str, mode: str = "ab+"):
+    """Opens path under an exclusive lock, retrying if a trim replaced the file meanwhile."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        f = open(path, mode)
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if not fcntl or os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                yield f
+                return
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+def history_append(path: str, records: np.ndarray):
+    """Appends records newer than the file's last one (another worker may have written this build already)."""
+    with history_locked(path) as f:
+        records = records[records["t"] > history_last_t(path, records.dtype)]
+        if len(records):
+            f.write(records.tobytes())
+
+def history_read(path: str, dtype, t_from: float, t_to: float) -> np.ndarray:
+    """Records with t_from <= t <= t_to; only that slice of the file is paged in."""
+    try:
+        n = os.path.getsize(path) // dtype.itemsize
+    except OSError:
+        return np.empty(0, dtype=dtype)
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    mm = np.memmap(path, dtype=dtype, mode="r", shape=(n,))
+    lo = int(np.searchsorted(mm["t"], t_from, side="left"))
+    hi = int(np.searchsorted(mm["t"], t_to, side="right"))
+    out = np.array(mm[lo:hi])
+    del mm
+    return out
+
+def history_trim(path: str, dtype, retention: int, now: float):
+    if now - HISTORY_TRIMMED.get(path, 0) < 3600:
+        return
+    HISTORY_TRIMMED[path] = now
+    with history_locked(path):
+        keep = history_read(path, dtype, now - retention, float("inf"))
+        if len(keep) == os.path.getsize(path) // dtype.itemsize:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        keep.tofile(tmp)
+        os.replace(tmp, path)
+
+def history_last_t(path: str, dtype) -> float:
+    try:
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < dtype.itemsize:
+                return float("-inf")
+            f.seek(size - size % dtype.itemsize - dtype.itemsize)
+            return float(np.frombuffer(f.read(dtype.itemsize), dtype=dtype)["t"][0])
+    except OSError:
+        return float("-inf")
+
+def history_rollup(field: str, tier: str, now: float):
+    """
+    Aggregates every bucket that closed since the tier's last record from the
+    raw file, so gaps between runs (idle app, restarts) are filled in, back as
+    far as raw retention. Built from disk rather than memory, so several
+    workers still produce exactly one correct record per bucket.
+    """
+    size, retention = HISTORY_TIERS[tier]
+    end = (now - HISTORY_SETTLE_SECONDS) // size * size  # buckets starting before this are closed
+    if HISTORY_ROLLED.get((field, tier), float("-inf")) >= end:
+        return
+    path = history_path(field, tier)
+    start = max(history_last_t(path, ROLLUP_DTYPE) + size, math.ceil((now - HISTORY_TIERS["raw"][1]) / size) * size)
+    rec = history_read(history_path(field, "raw"), RAW_DTYPE, start, end - 1e-6) if start < end else []
+    if len(rec):
+        buckets = rec["t"] // size * size
+        first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        n = np.diff(np.r_[first, len(rec)])
+        rolled = np.empty(len(first), dtype=ROLLUP_DTYPE)
+        rolled["t"] = buckets[first]
+        rolled["mean"] = np.add.reduceat(rec["v"].astype(float), first) / n
+        rolled["min"] = np.minimum.reduceat(rec["v"], first)
+        rolled["max"] = np.maximum.reduceat(rec["v"], first)
+        rolled["n"] = n
+        history_append(path, rolled)
+        history_trim(path, ROLLUP_DTYPE, retention, now)
+    HISTORY_ROLLED[(field, tier)] = end
+
+def record_history(layer: dict, now: float):
+    """Appends each field whose source was re-fetched since its last sample; cached re-reads write nothing."""
+    for field, (t, value) in history_samples(layer).items():
+        if t <= HISTORY_STORED.get(field, float("-inf")):
+            continue
+        raw_path = history_path(field, "raw")
+        history_append(raw_path, np.array([(t, float(value))], dtype=RAW_DTYPE))
+        history_trim(raw_path, RAW_DTYPE, HISTORY_TIERS["raw"][1], now)
+        HISTORY_STORED[field] = t
+
+def history_tick(now: float = None):
+    now = time.time() if now is None else now
+    with HISTORY_LOCK:
+        layer = HISTORY_LATEST["layer"]
+        if layer is not None:
+            record_history(layer, now)
+        for field in history_fields():
+            for tier, (size, _) in HISTORY_TIERS.items():
+                if size:
+                    history_rollup(field, tier, now)
+
+def history_loop():
+    while True:
+        try:
+            history_tick()
+        except Exception:
+            pass  # history is best-effort; the next tick retries
+        time.sleep(HISTORY_INTERVAL_SECONDS)
+
+def ensure_history_recorder():
+    if HISTORY_RECORDER["thread"] is not None:
+        return
+    with HISTORY_RECORDER_LOCK:
+        if HISTORY_RECORDER["thread"] is None:
+            t = threading.Thread(target=history_loop, name="hiema-history", daemon=True)
+            t.start()
+            HISTORY_RECORDER["thread"] = t
+
+def history_fields() -> list[str]:
+    try:
+        return sorted(d for d in os.listdir(HISTORY_DIR) if os.path.isdir(os.path.join(HISTORY_DIR, d)))
+    except OSError:
+        return []
+
+def query_history(field: str, t_from: float, t_to: float, resolution: str = "auto", max_points: int = HISTORY_MAX_POINTS) -> dict:
+    """
+    Points for field in [t_from, t_to] as [t, mean, min, max]. "auto" picks the
+    finest tier that still covers the range (retention) and fits max_points;
+    if it's still too long the slice is re-bucketed in NumPy.
+    """
+    now = time.time()
+    if resolution == "auto":
+        span_seconds = max(t_to - t_from, 1)
+        resolution = "1h"
+        for tier, (size, retention) in HISTORY_TIERS.items():
+            if t_from >= now - retention and span_seconds / max(size, LIVE_LAYER_TTL_SECONDS) <= max_points:
+                resolution = tier
+                break
+
+    if resolution == "raw":
+        rec = history_read(history_path(field, "raw"), RAW_DTYPE, t_from, t_to)
+        t, mean, lo, hi = rec["t"], rec["v"], rec["v"], rec["v"]
+        n = np.ones(len(rec))
+    else:
+        rec = history_read(history_path(field, resolution), ROLLUP_DTYPE, t_from, t_to)
+        t, mean, lo, hi, n = rec["t"], rec["mean"], rec["min"], rec["max"], rec["n"]
+
+    if len(t) > max_points:
+        # merge neighbours into max_points equal-count groups (weighted mean, true min/max)
+        edges = np.linspace(0, len(t), max_points + 1).astype(int)[:-1]
+        weights = np.add.reduceat(n, edges)
+        mean = np.add.reduceat(mean.astype(float) * n, edges) / weights
+        lo = np.minimum.reduceat(lo, edges)
+        hi = np.maximum.reduceat(hi, edges)
+        t = t[edges]
+
+    points = np.column_stack([t, mean, lo, hi]).round(3).tolist()
+    return {"field": field, "resolution": resolution, "from": t_from, "to": t_to, "points": points}
+
+# -----------------------------
+# Render cache (content-addressed chart PNGs + PDF bytes)
+# -----------------------------
+# Keyed by a hash of exactly the snapshot fields a render uses, so identical
+# data renders once. Bounded by total bytes, least recently used evicted.
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RENDER_CACHE = OrderedDict()  # content hash -> bytes
+RENDER_LOCK = threading.Lock()
+RENDER_STATS = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+HAZARD_CHART_FIELDS = [
+    "volcano_sites", "fire_events", "road_closures_live", "evacuation_features",
+    "shelters_layer_count", "water_shutoffs", "water_restrictions",
+]
+IMPACT_CHART_FIELDS = ["population_affected", "estimated_shelter_need"]
+PDF_FIELDS = [
+    "generated_at", "juris_label_pdf", "state_abbr", "event_label", "severity",
+    "strain_level", "strain_score", "eoc_recommendation",
+    "juris_population", "population_source", "population_affected", "affected_pct",
+    "estimated_shelter_need", "shelter_pct", "fema_disasters",
+    *HAZARD_CHART_FIELDS,
+    "weather", "nws_alerts", "feed_items", "situation_summary", "recommended_actions", "staffing",
+]
+
+def content_hash(kind: str, snapshot: dict, fields: list) -> str:
+    body = json.dumps([kind, [snapshot.get(f) for f in fields]], sort_keys=True, default=str)
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+def render_cached(key: str, render) -> bytes:
+    with RENDER_LOCK:
+        data = RENDER_CACHE.get(key)
+        if data is not None:
+            RENDER_CACHE.move_to_end(key)
+            RENDER_STATS["hits"] += 1
+            return data
+        RENDER_STATS["misses"] += 1
+
+    data = render()
+    if len(data) > RENDER_CACHE_MAX_BYTES:
+        return data
+
+    with RENDER_LOCK:
+        if key not in RENDER_CACHE:
+            RENDER_CACHE[key] = data
+            RENDER_STATS["bytes"] += len(data)
+        while RENDER_STATS["bytes"] > RENDER_CACHE_MAX_BYTES:
+            _, old = RENDER_CACHE.popitem(last=False)
+            RENDER_STATS["bytes"] -= len(old)
+            RENDER_STATS["evictions"] += 1
+    return data
+
+def render_stats() -> dict:
+    with RENDER_LOCK:
+        return {**RENDER_STATS, "entries": len(RENDER_CACHE), "max_bytes": RENDER_CACHE_MAX_BYTES}
+
 # -----------------------------
 # Charts (matplotlib -> ImageReader for canvas.drawImage)
 # -----------------------------
-def build_chart_images(snapshot: dict):
-    # 1) Hazards bar
-    labels = ["Volcano", "Fire", "Road\nClosures", "Evac", "Shelters", "Water\nShut", "Water\nRestr"]
-    vals = [
-        snapshot["volcano_sites"],
-        snapshot["fire_events"],
-        snapshot["road_closures_live"],
-        snapshot["evacuation_features"],
-        snapshot["shelters_layer_count"],
-        snapshot["water_shutoffs"],
-        snapshot["water_restrictions"],
-    ]
+# Object-oriented Figure/FigureCanvasAgg only (no pyplot global state), so
+# concurrent PDF requests can render safely. Each thread keeps one template
+# figure per chart and just updates bar heights before saving.
+# PDF_CHART_MODE=vector skips matplotlib entirely and draws the charts as
+# native ReportLab vector graphics (no PNG, no ImageReader round trip).
+PDF_CHART_MODE = os.getenv("PDF_CHART_MODE", "raster").lower()
+
+CHART_SPECS = {
+    "hazards": {
+        "title": "Hazards & Lifelines (HCCDA Live Counts)",
+        "labels": ["Volcano", "Fire", "Road\nClosures", "Evac", "Shelters", "Water\nShut", "Water\nRestr"],
+        "fields": HAZARD_CHART_FIELDS,
+        "figsize": (7.0, 2.3),
+        "ylabel": "Count",
+    },
+    "impact": {
+        "title": "Estimated Impact (Assumptions)",
+        "labels": ["Affected", "Shelter Need"],
+        "fields": IMPACT_CHART_FIELDS,
+        "figsize": (3.4, 2.3),
+        "ylabel": None,
+    },
+}
+CHART_TEMPLATES = threading.local()
+
+def chart_values(kind: str, snapshot: dict) -> list:
+    return [snapshot[f] for f in CHART_SPECS[kind]["fields"]]
+
+def chart_template(kind: str) -> dict:
+    templates = getattr(CHART_TEMPLATES, "figs", None)
+    if templates is None:
+        templates = CHART_TEMPLATES.figs = {}
+    if kind not in templates:
+        spec = CHART_SPECS[kind]
+        fig = Figure(figsize=spec["figsize"])
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        bars = ax.bar(spec["labels"], [0] * len(spec["labels"]))
+        ax.set_title(spec["title"])
+        if spec["ylabel"]:
+            ax.set_ylabel(spec["ylabel"])
+        templates[kind] = {"fig": fig, "ax": ax, "bars": bars}
+    return templates[kind]
+
+def render_chart(kind: str, vals: list, fmt: str = "png") -> bytes:
+    """PNG (180 dpi) or SVG bytes for one chart, drawn on this thread's template."""
+    tpl = chart_template(kind)
+    for bar, v in zip(tpl["bars"], vals):
+        bar.set_height(v)
+    tpl["ax"].set_ylim(0, (max(vals) or 1) * 1.05)
+    tpl["fig"].tight_layout()
+    buf = BytesIO()
+    tpl["fig"].savefig(buf, format=fmt, dpi=180)
+    return buf.getvalue()
 
-    plt.figure(figsize=(7.0, 2.3))
-    plt.bar(labels, vals)
-    plt.title("Hazards & Lifelines (HCCDA Live Counts)")
-    plt.ylabel("Count")
-    plt.tight_layout()
-    b1 = BytesIO()
-    plt.savefig(b1, format="png", dpi=180)
-    plt.close()
-    b1.seek(0)
-    img_haz = ImageReader(b1)
-
-    # 2) Impact chart (affected vs shelter need)
-    plt.figure(figsize=(3.4, 2.3))
-    plt.bar(["Affected", "Shelter Need"], [snapshot["population_affected"], snapshot["estimated_shelter_need"]])
-    plt.title("Estimated Impact (Assumptions)")
-    plt.tight_layout()
-    b2 = BytesIO()
-    plt.savefig(b2, format="png", dpi=180)
-    plt.close()
-    b2.seek(0)
-    img_imp = ImageReader(b2)
-
-    return img_haz, img_imp
+def build_chart_images(snapshot: dict):
+    images = []
+    for kind in ("hazards", "impact"):
+        png = render_cached(
+            content_hash(f"chart:{kind}", snapshot, CHART_SPECS[kind]["fields"]),
+            lambda kind=kind: render_chart(kind, chart_values(kind, snapshot)),
+        )
+        images.append(ImageReader(BytesIO(png)))
+    return tuple(images)
+
+def chart_drawing(kind: str, snapshot: dict, width: float, height: float) -> Drawing:
+    """Same chart as render_chart(), as a ReportLab vector Drawing for the PDF."""
+    spec = CHART_SPECS[kind]
+    vals = chart_values(kind, snapshot)
+
+    d = Drawing(width, height)
+    d.add(String(width / 2, height - 11, spec["title"], fontName="Helvetica", fontSize=8.5, textAnchor="middle"))
+
+    bc = VerticalBarChart()
+    bc.x, bc.y = 34, 24
+    bc.width, bc.height = width - 44, height - 44
+    bc.data = [vals]
+    bc.valueAxis.valueMin = 0
+    bc.valueAxis.valueMax = (max(vals) or 1) * 1.05
+    bc.valueAxis.labels.fontName = "Helvetica"
+    bc.valueAxis.labels.fontSize = 6.5
+    bc.categoryAxis.categoryNames = spec["labels"]
+    bc.categoryAxis.labels.fontName = "Helvetica"
+    bc.categoryAxis.labels.fontSize = 6.5
+    bc.categoryAxis.labels.dy = -2
+    bc.bars[0].fillColor = HexColor("#1f77b4")  # matplotlib's default blue
+    bc.bars[0].strokeColor = None
+    d.add(bc)
+    return d
 
 # -----------------------------
 # PDF generator (canvas) — NO Platypus, so no LayoutError
@@ -816,6 +2958,18 @@ def draw_wrapped(c, text, x, y, max_width, font="Helvetica", size=9.5, leading=1
     return y
 
 def build_snapshot_pdf(snapshot: dict, encrypt: bool = False, pdf_password: str = "") -> BytesIO:
+    """
+    Unencrypted PDFs come from the render cache when the snapshot fields they
+    print are unchanged. Encrypted ones are always rendered fresh (never cached).
+    """
+    with span("pdf"):
+        if encrypt and pdf_password and StandardEncryption:
+            return BytesIO(render_snapshot_pdf(snapshot, encrypt=True, pdf_password=pdf_password))
+        pdf = render_cached(content_hash(f"pdf:{PDF_CHART_MODE}", snapshot, PDF_FIELDS), lambda: render_snapshot_pdf(snapshot))
+        return BytesIO(pdf)
+
+def render_snapshot_pdf(snapshot: dict, encrypt: bool = False, pdf_password: str = "") -> bytes:
+    started = time.perf_counter()
     buf = BytesIO()
 
     # Optional encryption
@@ -995,15 +3149,21 @@ def build_snapshot_pdf(snapshot: dict, encrypt: bool = False, pdf_password: str
     y_mid -= 10
 
     # Charts area (bottom)
-    img_haz, img_imp = build_chart_images(snapshot)
     chart_y = bottom + 18
     haz_h = 155
     haz_w = (right - left) * 0.66
     imp_w = (right - left) - haz_w - 10
     imp_h = 155
 
-    c.drawImage(img_haz, left, chart_y, width=haz_w, height=haz_h, preserveAspectRatio=True, mask="auto")
-    c.drawImage(img_imp, left + haz_w + 10, chart_y, width=imp_w, height=imp_h, preserveAspectRatio=True, mask="auto")
+    if PDF_CHART_MODE == "vector":
+        with span("charts"):
+            renderPDF.draw(chart_drawing("hazards", snapshot, haz_w, haz_h), c, left, chart_y)
+            renderPDF.draw(chart_drawing("impact", snapshot, imp_w, imp_h), c, left + haz_w + 10, chart_y)
+    else:
+        with span("charts"):
+            img_haz, img_imp = build_chart_images(snapshot)
+        c.drawImage(img_haz, left, chart_y, width=haz_w, height=haz_h, preserveAspectRatio=True, mask="auto")
+        c.drawImage(img_imp, left + haz_w + 10, chart_y, width=imp_w, height=imp_h, preserveAspectRatio=True, mask="auto")
 
     # Footer
     c.setFont("Helvetica-Oblique", 7.7)
@@ -1015,8 +3175,357 @@ def build_snapshot_pdf(snapshot: dict, encrypt: bool = False, pdf_password: str
 
     c.showPage()
     c.save()
-    buf.seek(0)
-    return buf
+    observe("hiema_pdf_render_seconds", time.perf_counter() - started,
+            mode=PDF_CHART_MODE, encrypted="true" if encrypt and pdf_password and StandardEncryption else "false")
+    return buf.getvalue()
+
+# -----------------------------
+# PDF export jobs (async)
+# -----------------------------
+# POST /exports enqueues, a small worker pool renders, GET polls/downloads.
+# Identical in-flight unencrypted jobs (same printed content) share one job.
+# With CACHE_DB_PATH set, job state and finished PDFs live in the shared
+# SQLite file ("exports" table), so any worker can answer a poll or download
+# and de-duplication / the pending limit are host-wide. Without it jobs live
+# in this process only, which needs a single worker.
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_MAX_PENDING = int(os.getenv("EXPORT_MAX_PENDING", "20"))
+EXPORT_RETENTION_SECONDS = int(os.getenv("EXPORT_RETENTION_SECONDS", "900"))
+EXPORT_MAX_JOBS = int(os.getenv("EXPORT_MAX_JOBS", "100"))
+EXPORT_STALE_SECONDS = int(os.getenv("EXPORT_STALE_SECONDS", "300"))  # unfinished this long: its worker is gone
+
+EXPORT_POOL = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="hiema-export")
+EXPORT_JOBS = OrderedDict()  # job id -> job dict, oldest first (no CACHE_DB_PATH only)
+EXPORT_LOCK = threading.Lock()
+EXPORT_PENDING = ("queued", "running")
+EXPORT_COLUMNS = (
+    "id", "status", "event", "severity", "encrypted", "content",
+    "created", "started", "finished", "shared", "error",
+)
+
+def export_row(row, pdf=None) -> dict:
+    job = dict(zip(EXPORT_COLUMNS, row))
+    job["encrypted"] = bool(job["encrypted"])
+    job["pdf"] = pdf
+    return job
+
+def submit_export(snapshot: dict, encrypt: bool = False, pdf_password: str = ""):
+    """Returns the (new or de-duplicated) job, or None if the queue is full."""
+    encrypted = bool(encrypt and pdf_password and StandardEncryption)
+    content = None if encrypted else content_hash(f"pdf:{PDF_CHART_MODE}", snapshot, PDF_FIELDS)
+
+    job = {
+        "id": secrets.token_urlsafe(16),
+        "status": "queued",
+        "event": snapshot["event"],
+        "severity": snapshot["severity"],
+        "encrypted": encrypted,
+        "content": content,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "shared": 0,
+        "error": None,
+        "pdf": None,
+    }
+    with EXPORT_LOCK:
+        job, is_new = claim_export_shared(job) if CACHE_DB_PATH else claim_export_local(job)
+
+    if is_new:
+        EXPORT_POOL.submit(run_export, job, snapshot, encrypt, pdf_password)
+    return job
+
+def claim_export_local(job: dict):
+    """(job to report, whether it must be rendered); (None, False) when full. Caller holds EXPORT_LOCK."""
+    prune_exports()
+    for j in EXPORT_JOBS.values():
+        if job["content"] and j["content"] == job["content"] and j["status"] in EXPORT_PENDING:
+            j["shared"] += 1
+            return j, False
+    if sum(1 for j in EXPORT_JOBS.values() if j["status"] in EXPORT_PENDING) >= EXPORT_MAX_PENDING:
+        return None, False
+    EXPORT_JOBS[job["id"]] = job
+    return job, True
+
+def claim_export_shared(job: dict):
+    """Same as claim_export_local against the exports table, in one write transaction."""
+    cols = ", ".join(EXPORT_COLUMNS)
+    conn = disk_db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        prune_exports_shared(conn)
+        row = None
+        if job["content"]:
+            row = conn.execute(
+                f"SELECT {cols} FROM exports WHERE content = ? AND status IN ('queued', 'running')",
+                (job["content"],),
+            ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE exports SET shared = shared + 1 WHERE id = ?", (row[0],))
+            claimed, is_new = export_row(row), False
+            claimed["shared"] += 1
+        elif conn.execute(
+            "SELECT COUNT(*) FROM exports WHERE status IN ('queued', 'running')"
+        ).fetchone()[0] >= EXPORT_MAX_PENDING:
+            claimed, is_new = None, False
+        else:
+            conn.execute(
+                f"INSERT INTO exports ({cols}) VALUES ({', '.join('?' * len(EXPORT_COLUMNS))})",
+                tuple(job[c] for c in EXPORT_COLUMNS),
+            )
+            claimed, is_new = job, True
+        conn.execute("COMMIT")
+        return claimed, is_new
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def export_update(job: dict, pdf=None, **fields):
+    job.update(fields)
+    if pdf is not None:
+        job["pdf"] = pdf
+    if not CACHE_DB_PATH:
+        return
+    if pdf is not None:
+        fields["pdf"] = pdf
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    disk_db().execute(f"UPDATE exports SET {sets} WHERE id = ?", (*fields.values(), job["id"]))
+
+def run_export(job: dict, snapshot: dict, encrypt: bool, pdf_password: str):
+    try:
+        export_update(job, status="running", started=time.time())
+        pdf = build_snapshot_pdf(snapshot, encrypt=encrypt, pdf_password=pdf_password).getvalue()
+        export_update(job, pdf=pdf, status="done", finished=time.time())
+    except Exception as e:
+        try:
+            export_update(job, status="error", error=repr(e), finished=time.time())
+        except Exception:
+            pass  # shared store unavailable: the job goes stale and is failed by prune_exports_shared
+
+def export_get(job_id: str, with_pdf: bool = False):
+    if not CACHE_DB_PATH:
+        with EXPORT_LOCK:
+            return EXPORT_JOBS.get(job_id)
+    cols = ", ".join(EXPORT_COLUMNS + (("pdf",) if with_pdf else ()))
+    row = disk_db().execute(f"SELECT {cols} FROM exports WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    return export_row(row[:len(EXPORT_COLUMNS)], pdf=row[-1] if with_pdf else None)
+
+def export_pending() -> int:
+    if CACHE_DB_PATH:
+        try:
+            return disk_db().execute("SELECT COUNT(*) FROM exports WHERE status IN ('queued', 'running')").fetchone()[0]
+        except Exception:
+            return 0
+    with EXPORT_LOCK:
+        return sum(1 for j in EXPORT_JOBS.values() if j["status"] in EXPORT_PENDING)
+
+def prune_exports():
+    """Drop finished jobs past retention, then the oldest finished ones over EXPORT_MAX_JOBS. Caller holds EXPORT_LOCK."""
+    now = time.time()
+    finished = [j for j in EXPORT_JOBS.values() if j["finished"]]
+    for j in finished:
+        if now - j["finished"] > EXPORT_RETENTION_SECONDS:
+            del EXPORT_JOBS[j["id"]]
+    for j in [j for j in EXPORT_JOBS.values() if j["finished"]]:
+        if len(EXPORT_JOBS) <= EXPORT_MAX_JOBS:
+            break
+        del EXPORT_JOBS[j["id"]]
+
+def prune_exports_shared(conn: sqlite3.Connection):
+    """prune_exports for the exports table; also fails jobs whose worker died mid-render."""
+    now = time.time()
+    conn.execute(
+        "UPDATE exports SET status = 'error', error = 'export worker lost', finished = ? "
+        "WHERE status IN ('queued', 'running') AND created < ?",
+        (now, now - EXPORT_STALE_SECONDS),
+    )
+    conn.execute("DELETE FROM exports WHERE finished < ?", (now - EXPORT_RETENTION_SECONDS,))
+    conn.execute(
+        "DELETE FROM exports WHERE id IN ("
+        " SELECT id FROM exports WHERE finished IS NOT NULL ORDER BY finished DESC LIMIT -1 OFFSET ?)",
+        (EXPORT_MAX_JOBS,),
+    )
+
+def export_status(job: dict) -> dict:
+    out = {k: job[k] for k in ("id", "status", "event", "severity", "encrypted", "error")}
+    out["status_url"] = url_for("export_job", job_id=job["id"])
+    if job["status"] == "done":
+        out["download_url"] = url_for("export_download", job_id=job["id"])
+        out["render_seconds"] = round(job["finished"] - job["started"], 3)
+    return out
+
+# -----------------------------
+# Snapshot versions (ETag / 304 / JSON Patch)
+# -----------------------------
+# The ETag is a hash of the snapshot content: every key except the
+# per-source fetch metadata (ages tick on every live-layer rebuild even when
+# the data is the same), so an unchanged snapshot keeps its ETag and pollers
+# get 304s. Recent versions are kept so a client can ask for an RFC 6902
+# patch against the one it already has (?since=<etag>).
+SNAPSHOT_VERSIONS_MAX = int(os.getenv("SNAPSHOT_VERSIONS_MAX", "64"))
+SNAPSHOT_VERSIONS = OrderedDict()  # etag -> snapshot dict
+SNAPSHOT_VERSIONS_LOCK = threading.Lock()
+SNAPSHOT_VOLATILE = ("generated_at", "sources")  # fetch metadata, not content
+
+def snapshot_body(snap: dict) -> tuple[str, bytes]:
+    body = json.dumps(snap, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    content = {k: v for k, v in snap.items() if k not in SNAPSHOT_VOLATILE}
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+    etag = '"' + digest.hexdigest()[:24] + '"'
+    with SNAPSHOT_VERSIONS_LOCK:
+        SNAPSHOT_VERSIONS[etag] = snap
+        SNAPSHOT_VERSIONS.move_to_end(etag)
+        while len(SNAPSHOT_VERSIONS) > SNAPSHOT_VERSIONS_MAX:
+            SNAPSHOT_VERSIONS.popitem(last=False)
+    return etag, body
+
+def snapshot_version(etag: str):
+    with SNAPSHOT_VERSIONS_LOCK:
+        return SNAPSHOT_VERSIONS.get(etag)
+
+def json_pointer(path: str, key) -> str:
+    return path + "/" + str(key).replace("~", "~0").replace("/", "~1")
+
+def json_patch(old, new, path: str = "") -> list[dict]:
+    """
+    RFC 6902 ops turning old into new. Objects are diffed key by key; lists
+    and scalars that differ are replaced whole (snapshot lists are short).
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for k in old:
+            if k not in new:
+                ops.append({"op": "remove", "path": json_pointer(path, k)})
+        for k, v in new.items():
+            if k not in old:
+                ops.append({"op": "add", "path": json_pointer(path, k), "value": v})
+            else:
+                ops.extend(json_patch(old[k], v, json_pointer(path, k)))
+        return ops
+    if old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+# -----------------------------
+# Snapshot push (Server-Sent Events)
+# -----------------------------
+# One publisher thread re-reads the shared live layer every PUSH_TICK_SECONDS
+# and, for each event/severity somebody is watching, builds the scenario once,
+# diffs it against the last pushed version and fans the same serialized
+# message out to every subscriber. Unchanged snapshots push nothing.
+PUSH_TICK_SECONDS = int(os.getenv("PUSH_TICK_SECONDS", str(LIVE_LAYER_TTL_SECONDS)))
+PUSH_KEEPALIVE_SECONDS = int(os.getenv("PUSH_KEEPALIVE_SECONDS", "25"))
+PUSH_MAX_CLIENTS = int(os.getenv("PUSH_MAX_CLIENTS", "100"))
+PUSH_QUEUE_SIZE = 8
+PUSH_VOLATILE = SNAPSHOT_VOLATILE  # always differ; never a reason to push
+
+CHANNELS = {}  # (event, severity) -> {"snapshot", "seq", "subscribers": {id: sub}}
+CHANNELS_LOCK = threading.Lock()
+PUSH_STATS = {"clients": 0, "pushes": 0, "messages": 0, "dropped": 0}
+
+def sse_message(kind: str, seq: int, data: dict) -> str:
+    return f"event: {kind}\nid: {seq}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def changed_fields(old: dict, new: dict) -> dict:
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+def subscribe(event: str, severity: int):
+    """Returns (subscriber, first message) or (None, None) when PUSH_MAX_CLIENTS are connected."""
+    ensure_publisher()
+    key = (event, severity)
+    with CHANNELS_LOCK:
+        if PUSH_STATS["clients"] >= PUSH_MAX_CLIENTS:
+            return None, None
+        watched = key in CHANNELS
+    # New channel: build outside the lock (may wait on upstreams).
+    snap = None if watched else build_live_snapshot(event=event, severity=severity)
+
+    sub = {"queue": queue.Queue(maxsize=PUSH_QUEUE_SIZE), "closed": False, "key": key}
+    with CHANNELS_LOCK:
+        chan = CHANNELS.get(key)
+        if chan is None:
+            if snap is None:
+                snap = build_scenario_snapshot(get_live_layer(), event, severity)
+            chan = CHANNELS[key] = {"snapshot": snap, "seq": 0, "subscribers": {}}
+        chan["subscribers"][id(sub)] = sub
+        PUSH_STATS["clients"] += 1
+        first = sse_message("snapshot", chan["seq"], chan["snapshot"])
+    return sub, first
+
+def unsubscribe(sub: dict):
+    with CHANNELS_LOCK:
+        chan = CHANNELS.get(sub["key"])
+        if chan and id(sub) in chan["subscribers"]:
+            del chan["subscribers"][id(sub)]
+            PUSH_STATS["clients"] -= 1
+            if not chan["subscribers"]:
+                del CHANNELS[sub["key"]]
+
+def publish(key: tuple, snap: dict):
+    with CHANNELS_LOCK:
+        chan = CHANNELS.get(key)
+        if chan is None:
+            return
+        stable = {k: v for k, v in snap.items() if k not in PUSH_VOLATILE}
+        prev = {k: v for k, v in chan["snapshot"].items() if k not in PUSH_VOLATILE}
+        changes = changed_fields(prev, stable)
+        if not changes:
+            return
+        for k in PUSH_VOLATILE:
+            changes[k] = snap.get(k)
+        chan["snapshot"] = snap
+        chan["seq"] += 1
+        msg = sse_message("patch", chan["seq"], changes)  # serialized once for all subscribers
+        subs = list(chan["subscribers"].values())
+        PUSH_STATS["pushes"] += 1
+
+    for sub in subs:
+        try:
+            sub["queue"].put_nowait(msg)
+            PUSH_STATS["messages"] += 1
+        except queue.Full:
+            # Too far behind: close it; EventSource reconnects and gets a full snapshot.
+            sub["closed"] = True
+            PUSH_STATS["dropped"] += 1
+            unsubscribe(sub)
+
+def publisher_loop():
+    while True:
+        time.sleep(PUSH_TICK_SECONDS)
+        with CHANNELS_LOCK:
+            keys = list(CHANNELS)
+        if not keys:
+            continue
+        try:
+            live = get_live_layer()
+            for event, severity in keys:
+                publish((event, severity), build_scenario_snapshot(live, event, severity))
+        except Exception:
+            pass  # keep last pushed state; try again next tick
+
+PUBLISHER = {"thread": None}
+
+def ensure_publisher():
+    if PUBLISHER["thread"] is not None:
+        return
+    with CHANNELS_LOCK:
+        if PUBLISHER["thread"] is None:
+            t = threading.Thread(target=publisher_loop, name="hiema-publisher", daemon=True)
+            t.start()
+            PUBLISHER["thread"] = t
+
+def stream_events(sub: dict, first: str):
+    try:
+        yield first
+        while not sub["closed"]:
+            try:
+                yield sub["queue"].get(timeout=PUSH_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        unsubscribe(sub)
 
 # -----------------------------
 # Routes
@@ -1028,16 +3537,22 @@ def login():
 
     locked, remaining = is_locked(key)
     if locked:
+        if request.method == "POST":
+            inc("hiema_login_events_total", event="rejected_locked")
         return render_template("login.html", error=f"Too many attempts. Try again in {remaining} seconds.")
 
     if request.method == "POST":
         password = request.form.get("password", "")
         if password == APP_PASSWORD:
             clear_fails(key)
+            inc("hiema_login_events_total", event="success")
             session["logged_in"] = True
             return redirect(url_for("dashboard"))
         register_fail(key)
+        inc("hiema_login_events_total", event="failure")
         locked, remaining = is_locked(key)
+        if locked:
+            inc("hiema_login_events_total", event="lockout")
         error = f"Too many attempts. Try again in {remaining} seconds." if locked else "Invalid password."
 
     return render_template("login.html", error=error)
@@ -1049,29 +3564,213 @@ def logout():
 
 @app.route("/")
 def dashboard():
-    event = request.args.get("event", "baseline")
-    severity = safe_int(request.args.get("severity", 3), 3)
+    event, severity = scenario_args(request.args)
     snapshot = build_live_snapshot(event=event, severity=severity)
-    return render_template("dashboard.html", snapshot=snapshot)
+    with span("template"):
+        return render_template("dashboard.html", snapshot=snapshot)
+
+def scenario_args(args) -> tuple[str, int]:
+    """
+    Normalize event/severity from a request so unknown values collapse onto
+    the 5 x 5 known scenarios.
+    """
+    event = (args.get("event", "baseline") or "baseline").lower()
+    if event not in EVENT_PROFILES:
+        event = "baseline"
+    severity = clamp(safe_int(args.get("severity", 3), 3), 1, 5)
+    return event, severity
 
 @app.route("/api/snapshot")
 def api_snapshot():
-    event = request.args.get("event", "baseline")
-    severity = safe_int(request.args.get("severity", 3), 3)
+    """
+    Full snapshot with a strong ETag. If-None-Match -> 304; ?since=<etag> of
+    a recent version -> application/json-patch+json diff against it.
+    """
+    event, severity = scenario_args(request.args)
+    snap = build_live_snapshot(event=event, severity=severity)
+    with span("serialize"):
+        etag, body = snapshot_body(snap)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-    ck = f"snapshot:{event}:{severity}"
-    cached = cache_get(ck)
-    if cached:
-        return jsonify(cached)
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status=304, headers=headers)
 
-    snap = build_live_snapshot(event=event, severity=severity)
-    cache_set(ck, snap, ttl_seconds=60)  # 1 min feels live without hammering APIs
-    return jsonify(snap)
+    since = request.args.get("since", "")
+    previous = snapshot_version(since) if since else None
+    if previous is not None:
+        with span("patch"):
+            patch = json.dumps(json_patch(previous, snap), separators=(",", ":"), default=str)
+        return Response(patch, mimetype="application/json-patch+json", headers=headers)
+
+    return Response(body, mimetype="application/json", headers=headers)
+
+@app.route("/api/scenarios")
+def api_scenarios():
+    """
+    Every event x severity x population in one response.
+      ?event=wildfire&event=flood   (default: all EVENT_PROFILES)
+      ?severity=1&severity=5        (default: 1-5)
+      ?pop=150000&pop=250000 and/or ?pop_scale=0.8,1.0,1.2 (x live population;
+                                    default: the live population)
+      ?format=rows                  one object per combination instead of arrays
+    """
+    live = get_live_layer()
+    events = [e.lower() for e in request.args.getlist("event") if e.lower() in EVENT_PROFILES] or list(EVENT_PROFILES)
+    severities = sorted({clamp(safe_int(x, 3), 1, 5) for x in request.args.getlist("severity")}) or [1, 2, 3, 4, 5]
+
+    populations = [safe_int(x, 0) for x in request.args.getlist("pop")]
+    for scale in ",".join(request.args.getlist("pop_scale")).split(","):
+        try:
+            factor = float(scale)
+        except ValueError:
+            continue
+        if not (math.isfinite(factor) and abs(factor) <= SCENARIO_MAX_POP_SCALE):
+            return jsonify({"error": f"pop_scale must be a number up to {SCENARIO_MAX_POP_SCALE:g}."}), 400
+        populations.append(int(round(live["juris_population"] * factor)))
+    populations = [p for p in populations if p > 0] or [live["juris_population"]]
+    if max(populations) > SCENARIO_MAX_POPULATION:
+        return jsonify({"error": f"Populations must be at most {SCENARIO_MAX_POPULATION:,}."}), 400
+    if len(populations) > SCENARIO_MAX_POPULATIONS:
+        return jsonify({"error": f"At most {SCENARIO_MAX_POPULATIONS} populations per request."}), 400
+
+    with span("scenario_matrix"):
+        matrix = scenario_matrix(live, events, severities, populations)
+    matrix["live_version"] = live["live_version"]
+    matrix["generated_at"] = live["generated_at"]
+    if request.args.get("format") == "rows":
+        return jsonify({
+            "axes": matrix["axes"],
+            "live_version": matrix["live_version"],
+            "generated_at": matrix["generated_at"],
+            "rows": scenario_rows(matrix),
+        })
+    return jsonify(matrix)
+
+@app.route("/api/uncertainty")
+def api_uncertainty():
+    """p10/p50/p90 of affected, shelter need, strain and staffing for one scenario (Monte Carlo)."""
+    event, severity = scenario_args(request.args)
+    with span("monte_carlo"):
+        return jsonify(get_uncertainty(event, severity))
+
+def parse_time(value: str, default: float) -> float:
+    """Epoch seconds, ISO 8601, or relative like -6h / -30m / -7d."""
+    value = (value or "").strip()
+    if not value:
+        return default
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value.startswith("-") and value[-1:] in units:
+        return time.time() - float(value[1:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+@app.route("/api/history")
+def api_history():
+    """
+    ?field=fire_events&from=-24h&to=now[&resolution=auto|raw|5m|1h][&max_points=500]
+    Without field: the list of recorded fields.
+    """
+    field = request.args.get("field", "")
+    if not field:
+        return jsonify({"fields": history_fields(), "resolutions": list(HISTORY_TIERS)})
+    if field not in history_fields():
+        return jsonify({"error": f"No history for field {field!r}."}), 404
+
+    resolution = request.args.get("resolution", "auto")
+    if resolution != "auto" and resolution not in HISTORY_TIERS:
+        return jsonify({"error": f"resolution must be auto or one of {list(HISTORY_TIERS)}"}), 400
+    try:
+        now = time.time()
+        t_to = parse_time(request.args.get("to", ""), now)
+        t_from = parse_time(request.args.get("from", ""), t_to - 86400)
+    except ValueError:
+        return jsonify({"error": "from/to must be epoch seconds, ISO 8601, or like -6h."}), 400
+    max_points = clamp(safe_int(request.args.get("max_points", HISTORY_MAX_POINTS), HISTORY_MAX_POINTS), 1, HISTORY_MAX_POINTS)
+
+    with span("history"):
+        return jsonify(query_history(field, t_from, t_to, resolution, max_points))
+
+@app.route("/api/features")
+def api_features():
+    ensure_feature_sync()
+    return jsonify({"layers": feature_status(), "sync_seconds": FEATURE_SYNC_SECONDS, "grid_cell_km": GRID_CELL_KM})
+
+@app.route("/api/features/near")
+def api_features_near():
+    """
+    ?layer=shelters&km=10 plus either &lat=&lon= or &of=evacuations
+    [&attr=Status:Open ...] exact (case-insensitive) attribute filters
+    """
+    name, other = request.args.get("layer", ""), request.args.get("of", "")
+    if name not in FEATURE_SYNC_LAYERS or (other and other not in FEATURE_SYNC_LAYERS):
+        return jsonify({"error": f"layer/of must be one of {list(FEATURE_SYNC_LAYERS)}"}), 400
+    try:
+        km = float(request.args.get("km", "10"))
+        filters = [tuple(a.split(":", 1)) for a in request.args.getlist("attr")]
+        if any(len(f) != 2 for f in filters):
+            raise ValueError("attr")
+        lat = float(request.args["lat"]) if not other else None
+        lon = float(request.args["lon"]) if not other else None
+        if not 0 <= km <= FEATURE_MAX_KM:  # also False for nan
+            raise ValueError("km")
+        if not other and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat/lon")
+    except (KeyError, ValueError):
+        return jsonify({"error": f"Need km between 0 and {FEATURE_MAX_KM:g}, attr as field:value, "
+                                 "and a valid lat/lon unless of= is given."}), 400
+
+    try:
+        started = time.perf_counter()
+        with span("spatial_query"):
+            if other:
+                hits = features_near_layer(name, other, km, filters)
+            else:
+                hits = features_near_point(name, lat, lon, km, filters)
+        query_ms = (time.perf_counter() - started) * 1000
+    except FeaturesSyncing as e:
+        body = {"error": f"Layer {e} is still syncing.", "status": "syncing", "layers": feature_status()}
+        return jsonify(body), 503, {"Retry-After": "5"}
+
+    rows = []
+    for d, feat, near in hits:
+        lat_, lon_ = from_km(*feat["anchor"])
+        row = {"oid": feat["oid"], "distance_km": round(d, 3), "lat": round(lat_, 6), "lon": round(lon_, 6),
+               "attributes": feat["attributes"]}
+        if near is not None:
+            row[f"nearest_{other}_oid"] = near
+        rows.append(row)
+    return jsonify({"layer": name, "of": other or None, "km": km, "count": len(rows),
+                    "query_ms": round(query_ms, 3), "features": rows})
+
+@app.route("/api/stream")
+def api_stream():
+    event, severity = scenario_args(request.args)
+    sub, first = subscribe(event, severity)
+    if sub is None:
+        return jsonify({"error": "Too many live dashboards connected; falling back to polling."}), 503
+    return Response(
+        stream_events(sub, first),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/metrics")
+def metrics():
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/cache_stats")
+def api_cache_stats():
+    return jsonify({**cache_stats(), "render": render_stats(), "push": dict(PUSH_STATS), "breakers": breaker_stats()})
 
 @app.route("/download_pdf", methods=["POST"])
 def download_pdf():
-    event = request.form.get("event", "baseline")
-    severity = safe_int(request.form.get("severity", 3), 3)
+    event, severity = scenario_args(request.form)
 
     encrypt_flag = request.form.get("encrypt_pdf") == "on"
     pdf_password = (request.form.get("pdf_password", "") or "").strip()
@@ -1086,5 +3785,40 @@ def download_pdf():
         mimetype="application/pdf",
     )
 
+@app.route("/exports", methods=["POST"])
+def export_create():
+    event, severity = scenario_args(request.form)
+
+    encrypt_flag = request.form.get("encrypt_pdf") == "on"
+    pdf_password = (request.form.get("pdf_password", "") or "").strip()
+
+    snap = build_live_snapshot(event=event, severity=severity)
+    job = submit_export(snap, encrypt=encrypt_flag, pdf_password=pdf_password)
+    if job is None:
+        return jsonify({"error": "Export queue is full. Try again shortly."}), 503
+    return jsonify(export_status(job)), 202
+
+@app.route("/exports/<job_id>")
+def export_job(job_id):
+    job = export_get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired export job."}), 404
+    return jsonify(export_status(job))
+
+@app.route("/exports/<job_id>/download")
+def export_download(job_id):
+    job = export_get(job_id, with_pdf=True)
+    if job is None:
+        return jsonify({"error": "Unknown or expired export job."}), 404
+    if job["status"] != "done":
+        return jsonify(export_status(job)), 409
+    return send_file(
+        BytesIO(job["pdf"]),
+        as_attachment=True,
+        download_name="Hawaii_County_Live_Snapshot.pdf",
+        mimetype="application/pdf",
+    )
+
 if __name__ == "__main__":
+    ensure_feature_sync()
     app.run(debug=True)
\ No newline at end of file
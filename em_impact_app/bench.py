@@ -0,0 +1,202 @@
+# bench.py
+# Offline benchmark for em_impact_app: route latency/throughput plus timings
+# of the expensive stages, against replayed upstream fixtures (see fixtures.py).
+#
+#   python bench.py --concurrency 8 --requests 200 --out bench_new.json
+#   python bench.py --compare bench_old.json bench_new.json --max-regression 0.15
+#
+# --compare exits 1 if any p95 got slower by more than --max-regression (and
+# at least --min-delta-ms), or a benchmark gained errors, so a
+# change can be gated on it. Results are plain JSON, one entry per benchmark.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before app is imported
+os.environ.setdefault("UPSTREAM_MODE", "replay")
+os.environ.setdefault("BACKGROUND_REFRESH", "0")
+
+SCENARIOS = [(e, s) for e in ("baseline", "wildfire", "hurricane", "flood", "volcano") for s in (1, 3, 5)]
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def summarize(samples: list, wall: float, errors: int = 0) -> dict:
+    ms = [x * 1000 for x in samples]
+    return {
+        "n": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 0.50), 2),
+        "p95_ms": round(percentile(ms, 0.95), 2),
+        "p99_ms": round(percentile(ms, 0.99), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "rps": round(len(ms) / wall, 1) if wall else 0.0,
+    }
+
+def timed_calls(fn, n: int, concurrency: int = 1) -> dict:
+    """Calls fn(i) n times on `concurrency` threads. fn returns True on success."""
+    samples, errors = [], 0
+
+    def one(i):
+        t = time.perf_counter()
+        ok = fn(i)
+        return time.perf_counter() - t, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, ok in pool.map(one, range(n)):
+            samples.append(elapsed)
+            errors += 0 if ok else 1
+    return summarize(samples, time.perf_counter() - start, errors)
+
+def client_for(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["logged_in"] = True
+    return client
+
+def bench_routes(app_module, n: int, concurrency: int) -> dict:
+    def get(path):
+        def call(i):
+            event, severity = SCENARIOS[i % len(SCENARIOS)]
+            r = client_for(app_module).get(f"{path}?event={event}&severity={severity}")
+            return r.status_code == 200
+        return call
+
+    def pdf(i):
+        event, severity = SCENARIOS[i % len(SCENARIOS)]
+        r = client_for(app_module).post("/download_pdf", data={"event": event, "severity": severity})
+        return r.status_code == 200 and r.data[:5] == b"%PDF-"
+
+    app_module.get_live_layer()  # warm: routes are measured against a shared live layer
+    return {
+        "route:/": timed_calls(get("/"), n, concurrency),
+        "route:/api/snapshot": timed_calls(get("/api/snapshot"), n, concurrency),
+        "route:/download_pdf": timed_calls(pdf, max(1, n // 4), concurrency),
+    }
+
+def bench_stages(app_module, n: int) -> dict:
+    """Single-threaded timings of each stage with its caches bypassed."""
+    live = app_module.get_live_layer()
+    snaps = [app_module.build_scenario_snapshot(live, e, s) for e, s in SCENARIOS]
+
+    def cold_live_layer(i):
+        with app_module.CACHE_LOCK:
+            app_module.CACHE.clear()
+        app_module.build_live_layer()
+        return True
+
+    def scenario(i):
+        event, severity = SCENARIOS[i % len(SCENARIOS)]
+        app_module.build_scenario_snapshot(live, event, severity)
+        return True
+
+    def charts(i):
+        snap = snaps[i % len(snaps)]
+        for kind in app_module.CHART_SPECS:
+            app_module.render_chart(kind, app_module.chart_values(kind, snap))
+        return True
+
+    def pdf(i):
+        return app_module.render_snapshot_pdf(snaps[i % len(snaps)])[:5] == b"%PDF-"
+
+    return {
+        "stage:live_layer_cold": timed_calls(cold_live_layer, max(1, n // 10)),
+        "stage:scenario_snapshot": timed_calls(scenario, n * 10),
+        "stage:chart_render": timed_calls(charts, n),
+        "stage:pdf_render": timed_calls(pdf, max(1, n // 4)),
+    }
+
+def git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def run(args) -> dict:
+    import fixtures
+    import app as app_module
+
+    if app_module.UPSTREAM_MODE == "replay" and not os.path.isdir(fixtures.FIXTURES_DIR):
+        print(f"warning: no fixtures in {fixtures.FIXTURES_DIR}; upstreams will 404 and fall back "
+              f"(record some with UPSTREAM_MODE=record)", file=sys.stderr)
+
+    results = {}
+    if args.only in ("all", "stages"):
+        results.update(bench_stages(app_module, args.requests))
+    if args.only in ("all", "routes"):
+        results.update(bench_routes(app_module, args.requests, args.concurrency))
+
+    return {
+        "meta": {
+            "git": git_rev(),
+            "when": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "upstream_mode": app_module.UPSTREAM_MODE,
+            "faults": dict(fixtures.FAULTS),
+            "pdf_chart_mode": app_module.PDF_CHART_MODE,
+        },
+        "results": results,
+    }
+
+def print_table(report: dict):
+    print(f"{'benchmark':<26}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}{'err':>5}")
+    for name, r in report["results"].items():
+        print(f"{name:<26}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rps']:>9}{r['errors']:>5}")
+
+def compare(old_path: str, new_path: str, max_regression: float, min_delta_ms: float) -> int:
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)["results"]
+
+    failed = False
+    print(f"{'benchmark':<26}{'old p95':>10}{'new p95':>10}{'change':>9}")
+    for name in sorted(set(old) & set(new)):
+        a, b = old[name]["p95_ms"], new[name]["p95_ms"]
+        change = (b - a) / a if a else 0.0
+        flag = ""
+        slower = change > max_regression and b - a >= min_delta_ms  # ignore sub-ms noise
+        if slower or new[name]["errors"] > old[name]["errors"]:
+            flag = "  REGRESSION"
+            failed = True
+        print(f"{name:<26}{a:>10}{b:>10}{change:>+9.1%}{flag}")
+    return 1 if failed else 0
+
+def main():
+    ap = argparse.ArgumentParser(description="em_impact_app benchmark")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=100, help="requests per route benchmark")
+    ap.add_argument("--only", choices=("all", "routes", "stages"), default="all")
+    ap.add_argument("--out", default="", help="write the JSON report here")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    ap.add_argument("--max-regression", type=float, default=0.15, help="allowed p95 slowdown for --compare")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="smaller p95 changes never count as regressions")
+    args = ap.parse_args()
+
+    if args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.max_regression, args.min_delta_ms))
+
+    report = run(args)
+    print_table(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
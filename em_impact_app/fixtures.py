@@ -0,0 +1,199 @@
+# fixtures.py
+# Record / replay of upstream HTTP responses (Census, FEMA, NWS, ArcGIS, HCCDA RSS)
+# so em_impact_app can be load-tested offline and repeatably.
+#
+# app.py picks the mode from UPSTREAM_MODE:
+#   live    - normal network calls (default)
+#   record  - network calls, and every response is saved under FIXTURES_DIR
+#   replay  - no network; responses come from FIXTURES_DIR in-process
+#   stub    - requests go to a local stub server (UPSTREAM_STUB_URL), see below
+#
+# Stub server (serves the same fixture files over real HTTP):
+#   python fixtures.py serve --port 8765 --latency-ms 150 --error-rate 0.05
+#   UPSTREAM_MODE=stub UPSTREAM_STUB_URL=http://127.0.0.1:8765 python app.py
+#
+# Replay and stub share the same fault knobs: latency (mean + jitter), an
+# error rate (503s) and a timeout rate (hangs past the caller's timeout).
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+
+import requests
+
+FIXTURES_DIR = os.getenv("FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+
+# Never written to fixture files or used in fixture names
+SECRET_PARAMS = {"key", "token", "api_key", "apikey"}
+
+# Response headers worth keeping (validators matter for the 304 paths)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+# Fault injection (replay and stub)
+FAULTS = {
+    "latency_ms": float(os.getenv("UPSTREAM_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("UPSTREAM_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("UPSTREAM_ERROR_RATE", "0")),
+    "timeout_rate": float(os.getenv("UPSTREAM_TIMEOUT_RATE", "0")),
+}
+RNG = random.Random(int(os.getenv("UPSTREAM_SEED", "352")))
+RNG_LOCK = threading.Lock()
+
+def canonical_url(url: str, params=None) -> str:
+    """Full request URL with sorted query and secrets removed: the fixture identity."""
+    prepared = requests.Request("GET", url, params=params).prepare().url
+    parts = urlparse(prepared)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+def fixture_path(url: str) -> str:
+    host = urlparse(url).netloc or "unknown"
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(FIXTURES_DIR, host, f"{digest}.json")
+
+def record(url: str, params, r: requests.Response):
+    """Saves one upstream response. Written atomically, last response wins."""
+    url = canonical_url(url, params)
+    path = fixture_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = {
+        "url": url,
+        "status": r.status_code,
+        "headers": {h: r.headers[h] for h in KEPT_HEADERS if h in r.headers},
+        "text": r.text,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(body, f, indent=1)
+    os.replace(tmp, path)
+
+def load(url: str):
+    try:
+        with open(fixture_path(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def pick_fault() -> str:
+    """'error', 'timeout' or '' for this call, after sleeping the injected latency."""
+    with RNG_LOCK:
+        delay = max(0.0, FAULTS["latency_ms"] + RNG.uniform(-1, 1) * FAULTS["jitter_ms"]) / 1000.0
+        roll = RNG.random()
+    if delay:
+        time.sleep(delay)
+    if roll < FAULTS["error_rate"]:
+        return "error"
+    if roll < FAULTS["error_rate"] + FAULTS["timeout_rate"]:
+        return "timeout"
+    return ""
+
+def fixture_response(fx, url: str, headers=None) -> tuple[int, dict, bytes]:
+    """(status, headers, body) for a stored fixture, honouring If-None-Match / If-Modified-Since."""
+    if fx is None:
+        return 404, {"Content-Type": "application/json"}, json.dumps({"error": f"no fixture for {url}"}).encode()
+    headers = headers or {}
+    stored = fx["headers"]
+    if fx["status"] == 200 and (
+        (stored.get("ETag") and headers.get("If-None-Match") == stored["ETag"])
+        or (stored.get("Last-Modified") and headers.get("If-Modified-Since") == stored["Last-Modified"])
+    ):
+        return 304, dict(stored), b""
+    return fx["status"], dict(stored), fx["text"].encode("utf-8")
+
+def replay(url: str, params=None, headers=None, timeout=12) -> requests.Response:
+    """In-process stand-in for Session.get() that answers from FIXTURES_DIR."""
+    url = canonical_url(url, params)
+    fault = pick_fault()
+    if fault == "timeout":
+        time.sleep(timeout)
+        raise requests.exceptions.ReadTimeout(f"injected timeout: {url}")
+
+    if fault == "error":
+        status, hdrs, body = 503, {"Content-Type": "text/plain"}, b"injected error"
+    else:
+        status, hdrs, body = fixture_response(load(url), url, headers)
+
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(hdrs)
+    r._content = body
+    r.encoding = "utf-8"
+    r.url = url
+    return r
+
+def stub_url(stub_base: str, url: str, params=None) -> str:
+    """https://host/path?q -> <stub_base>/host/path?q (secrets dropped)."""
+    parts = urlparse(canonical_url(url, params))
+    return f"{stub_base.rstrip('/')}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+# -----------------------------
+# Stub server
+# -----------------------------
+def create_stub_app():
+    from flask import Flask, Response, request
+
+    stub = Flask(__name__)
+    stats = {"requests": 0, "errors": 0, "timeouts": 0, "missing": 0}
+
+    @stub.route("/_stats")
+    def stub_stats():
+        return stats
+
+    @stub.route("/<host>/", defaults={"path": ""})
+    @stub.route("/<host>/<path:path>")
+    def serve(host, path):
+        stats["requests"] += 1
+        query = request.query_string.decode("utf-8")
+        url = f"https://{host}/{path}" + (f"?{query}" if query else "")
+        fault = pick_fault()
+        if fault == "timeout":
+            stats["timeouts"] += 1
+            time.sleep(float(request.headers.get("X-Stub-Hang", "60")))
+        if fault == "error":
+            stats["errors"] += 1
+            return Response("injected error", status=503, mimetype="text/plain")
+        fx = load(url)
+        if fx is None:
+            stats["missing"] += 1
+        status, hdrs, body = fixture_response(fx, url, request.headers)
+        return Response(body, status=status, headers=hdrs)
+
+    return stub
+
+def main():
+    ap = argparse.ArgumentParser(description="Upstream fixture tools for em_impact_app")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    serve = sub.add_parser("serve", help="serve recorded fixtures over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency-ms", type=float, default=FAULTS["latency_ms"])
+    serve.add_argument("--jitter-ms", type=float, default=FAULTS["jitter_ms"])
+    serve.add_argument("--error-rate", type=float, default=FAULTS["error_rate"])
+    serve.add_argument("--timeout-rate", type=float, default=FAULTS["timeout_rate"])
+
+    sub.add_parser("list", help="list recorded fixtures")
+
+    args = ap.parse_args()
+    if args.cmd == "list":
+        for root, _, files in sorted(os.walk(FIXTURES_DIR)):
+            for name in sorted(files):
+                with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                    fx = json.load(f)
+                print(f"{fx['status']}  {len(fx['text']):>8}  {fx['url']}")
+        return
+
+    FAULTS.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, timeout_rate=args.timeout_rate,
+    )
+    create_stub_app().run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
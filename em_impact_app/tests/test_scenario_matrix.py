@@ -0,0 +1,69 @@
+# The vectorized scenario matrix must agree with the scalar snapshot path
+# (compute_assumptions -> compute_strain -> recommend_eoc_and_staffing) for
+# every event x severity x population.
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("UPSTREAM_MODE", "replay")
+os.environ.setdefault("BACKGROUND_REFRESH", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+POPULATIONS = [1, 999, 50_000, 150_000, 210_000, 400_000, 2_000_000, 1_000_000_000]
+COMPARED = [
+    "population_affected", "estimated_shelter_need", "affected_pct", "shelter_pct",
+    "strain_score", "strain_level", "eoc_recommendation", "staffing",
+]
+
+def live_layer(active: bool) -> dict:
+    n = 3 if active else 0
+    return {
+        "juris_population": 210_000,
+        "fire_events": n,
+        "road_closures_live": n,
+        "water_shutoffs": n,
+        "water_restrictions": 0,
+        "volcano_sites": n,
+        "evacuation_features": n,
+        "nws_alerts": [{"headline": "Flood Watch"}] * n,
+    }
+
+@pytest.mark.parametrize("active", [False, True])
+def test_matrix_matches_scalar_path(active):
+    live = live_layer(active)
+    events = list(app.EVENT_PROFILES)
+    severities = [1, 2, 3, 4, 5]
+    rows = app.scenario_rows(app.scenario_matrix(live, events, severities, POPULATIONS))
+    assert len(rows) == len(events) * len(severities) * len(POPULATIONS)
+
+    for row in rows:
+        scalar = app.build_scenario_snapshot({**live, "juris_population": row["population"]}, row["event"], row["severity"])
+        for field in COMPARED:
+            assert row[field] == scalar[field], (row["event"], row["severity"], row["population"], field)
+
+def test_api_rejects_non_finite_or_huge_pop_scale(monkeypatch):
+    monkeypatch.setattr(app, "get_live_layer", lambda: {**live_layer(False), "live_version": "t", "generated_at": "t"})
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s["logged_in"] = True
+
+    for bad in ("inf", "-inf", "nan", "1e308"):
+        r = client.get(f"/api/scenarios?pop_scale={bad}")
+        assert r.status_code == 400
+    assert client.get("/api/scenarios?pop_scale=0.5,1&format=rows").status_code == 200
+
+def test_api_rejects_oversized_population(monkeypatch):
+    monkeypatch.setattr(app, "get_live_layer", lambda: {**live_layer(False), "live_version": "t", "generated_at": "t"})
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s["logged_in"] = True
+
+    assert client.get(f"/api/scenarios?pop={10**23}").status_code == 400
+    assert client.get(f"/api/scenarios?pop={app.SCENARIO_MAX_POPULATION + 1}").status_code == 400
+    r = client.get(f"/api/scenarios?pop={app.SCENARIO_MAX_POPULATION}&event=flood&severity=5&format=rows")
+    assert r.status_code == 200
+    assert r.get_json()["rows"][0]["population_affected"] > 0